@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve the gate lookup/scan views with their async versions under ASGI
+os.environ.setdefault('GATE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
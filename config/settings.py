@@ -38,12 +38,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gate.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Vercel Static File Handler
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'gate.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gate.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,6 +58,9 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
+        # Without an explicit 'loaders' list Django wraps the filesystem and
+        # app loaders in the cached loader, so templates are parsed once per
+        # process (and reloaded on change under runserver)
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -84,6 +90,74 @@ if database_url:
     DATABASES["default"] = dj_database_url.parse(database_url)
 
 
+# Cache
+# Per-process memory by default. Set REDIS_URL to share occupancy counters
+# and lookups between workers (requires the redis package).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+redis_url = os.environ.get("REDIS_URL")
+if redis_url:
+    CACHES["default"] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': redis_url,
+    }
+
+# Seconds a cached dashboard fragment ({% cache %}) lives; writes make it
+# unreachable sooner by replacing its version (gate.fragments). Versions are
+# cache entries, so without a shared cache (REDIS_URL) a write would only
+# reach its own worker: fragments are then not cached at all.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 if redis_url else 0
+
+# Fragments that show time-dependent labels or live traffic totals are
+# re-rendered at least this often
+FRAGMENT_TIME_BUCKET = 60
+
+# Seconds before cached occupancy counters are recounted from the DB. Scans
+# and invalidations update cache entries, so without a shared cache
+# (REDIS_URL) each worker only sees its own: the counters are then recounted
+# every few seconds instead, bounding how far workers can drift apart.
+OCCUPANCY_CACHE_TIMEOUT = 300 if redis_url else 10
+
+# Seconds during which a resubmitted scan idempotency key is treated as a duplicate
+SCAN_IDEMPOTENCY_WINDOW = 60
+
+# Seconds between live-feed polls of MovementLog (one query per tick per process)
+LIVE_POLL_INTERVAL = 1.0
+
+# Upper bound on how long a user's cached roles are reused; group and
+# permission changes invalidate them immediately through gate.signals. The
+# invalidation is a cache counter, so without a shared cache (REDIS_URL) it
+# would not reach other workers: roles are then resolved on every request.
+ROLE_CACHE_SECONDS = 300 if redis_url else 0
+
+# Seconds a background job may stay running before run_jobs assumes its
+# worker died and marks it failed
+JOB_TIMEOUT = 60 * 60
+
+# Export counters for work done outside the web workers (import rows from
+# run_jobs). They are cache counters, so they need a shared cache (REDIS_URL);
+# with a per-process cache /metrics would never see them.
+METRICS_SHARED_COUNTERS = bool(redis_url)
+
+# Bearer token required by /metrics. Without one, /metrics is only served
+# when DEBUG is on and returns 404 otherwise.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Route the gate views that have async twins (gate.async_views) to those.
+# config/asgi.py sets this; WSGI deployments keep the sync views.
+GATE_ASYNC_VIEWS = os.environ.get("GATE_ASYNC_VIEWS") == "1"
+
+# Seconds a device lookup (api/v2/check) stays cached; saves invalidate it
+# sooner. Invalidation deletes cache entries, so without a shared cache
+# (REDIS_URL) other workers would keep answering with a stale is_inside or
+# pass: lookups then always read the DB.
+LOOKUP_CACHE_TIMEOUT = 300 if redis_url else 0
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,8 +213,18 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session Settings
+# cached_db reads sessions from the cache and only falls back to the DB on a
+# miss. It needs a shared cache (REDIS_URL): with per-process caches each
+# worker keeps its own copy, so a logout in one would leave the session alive
+# in the others, and throttled saves would overwrite each other.
+SESSION_ENGINE = (
+    "django.contrib.sessions.backends.cached_db" if redis_url else "django.contrib.sessions.backends.db"
+)
 SESSION_COOKIE_AGE = 3 * 60 * 60      # 10800 seconds
-SESSION_SAVE_EVERY_REQUEST = True     # extend on activity
+SESSION_SAVE_EVERY_REQUEST = False    # gate.middleware.SessionRefreshMiddleware extends on activity
+# Fraction of SESSION_COOKIE_AGE after which an active session is re-saved
+# (0.1 = at most one write per 18 minutes; expiry may land that much early)
+SESSION_REFRESH_FRACTION = float(os.environ.get("SESSION_REFRESH_FRACTION", "0.1"))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # Media Files
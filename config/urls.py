@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
-from gate import views
+from gate import views, async_views
 from django.conf import settings
 from django.conf.urls.static import static
 
+# Gate views with an async twin; ASGI deployments route to those
+gate_views = async_views if settings.GATE_ASYNC_VIEWS else views
+
 
 urlpatterns = [
 
@@ -33,9 +36,14 @@ urlpatterns = [
     # =========================
     # Gate Operations
     # =========================
-    path("gate/check/", views.check, name="check"),
-    path("gate/toggle/", views.toggle_status, name="gate_toggle"),
-    path("logs/", views.home, name="logs"),
+    path("gate/check/", gate_views.check, name="check"),
+    path("gate/toggle/", gate_views.toggle_status, name="gate_toggle"),
+    path("gate/scan/", gate_views.scan, name="gate_scan"),
+    path("logs/", views.logs, name="logs"),
+    path("logs/export/", views.export_logs, name="export_logs"),
+    path("analytics/", views.warden_dashboard, name="warden_dashboard"),
+    path("live/feed/", gate_views.live_feed, name="live_feed"),
+    path("live/poll/", views.live_poll, name="live_poll"),
 
     # =========================
     # Approval System
@@ -43,12 +51,16 @@ urlpatterns = [
     path("approval/", views.approval_dashboard, name="approval_dashboard"),
     path("approval/<int:request_id>/approve/", views.approve_leave, name="approve_leave"),
     path("approval/<int:request_id>/reject/", views.reject_leave, name="reject_leave"),
+    path("approval/bulk/", views.bulk_leave_action, name="bulk_leave_action"),
 
     # =========================
     # Student Management
     # =========================
     path("students/add/", views.add_student, name="add_student"),
     path("students/import/", views.import_students_csv, name="import_students_csv"),
+    path("students/import/photos/", views.import_photos_zip, name="import_photos_zip"),
+    path("jobs/<int:job_id>/", views.job_status, name="job_status"),
+    path("photos/thumbs/<str:name>", views.photo_thumbnail, name="photo_thumbnail"),
 
     # =========================
     # Lists
@@ -59,7 +71,16 @@ urlpatterns = [
     # =========================
     # API (Mobile / Future)
     # =========================
-    path("api/v1/check/", views.api_check, name="api_check"),
+    path("api/v1/check/", gate_views.api_check, name="api_check"),
+    path("api/v2/check/", views.api_check_v2, name="api_check_v2"),
+    path("api/v1/kiosk/snapshot/", views.kiosk_snapshot, name="kiosk_snapshot"),
+    path("api/v1/kiosk/delta/", views.kiosk_delta, name="kiosk_delta"),
+    path("api/v1/kiosk/scans/", views.kiosk_upload_scans, name="kiosk_upload_scans"),
+
+    # =========================
+    # Monitoring
+    # =========================
+    path("metrics", views.metrics_view, name="metrics"),
 
     # =========================
     # Authentication
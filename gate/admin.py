@@ -1,5 +1,28 @@
+from datetime import datetime
+
 from django.contrib import admin
-from .models import Student, MovementLog
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Student, MovementLog, MovementLogArchive, DailyMovementRollup, Job
+
+
+def _range_end(params):
+    """End of the timestamp range a changelist URL filters on, or None."""
+    value = params.get("timestamp__lt") or params.get("timestamp__lte")
+    if not value:
+        return None
+    try:
+        end = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        return None
+    if end is not None and not isinstance(end, datetime):
+        end = datetime.combine(end, datetime.min.time())
+    if end is not None and timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    return end
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -12,6 +35,56 @@ class MovementLogAdmin(admin.ModelAdmin):
     list_display = ("student", "direction", "timestamp", "recorded_by")
     search_fields = ("student__enrollment_number", "student__full_name")
     list_filter = ("direction", "timestamp")
+    list_select_related = ("student", "recorded_by")
+    # Skip the unfiltered COUNT(*) on every changelist load
+    show_full_result_count = False
+
+    # Closed months live in MovementLogArchive (see archive_logs). Ranges and
+    # rows that are only there open the archive admin with the same filters.
+    def changelist_view(self, request, extra_context=None):
+        end = _range_end(request.GET)
+        if end is not None and not MovementLog.objects.filter(timestamp__lt=end).exists():
+            if MovementLogArchive.objects.filter(timestamp__lt=end).exists():
+                url = reverse("admin:gate_movementlogarchive_changelist")
+                return redirect(f"{url}?{request.GET.urlencode()}")
+        return super().changelist_view(request, extra_context)
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        if (
+            str(object_id).isdigit()
+            and not MovementLog.objects.filter(pk=object_id).exists()
+            and MovementLogArchive.objects.filter(pk=object_id).exists()
+        ):
+            return redirect("admin:gate_movementlogarchive_change", object_id)
+        return super().change_view(request, object_id, form_url, extra_context)
+
+@admin.register(MovementLogArchive)
+class MovementLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ("student", "direction", "timestamp", "recorded_by")
+    search_fields = ("student__enrollment_number", "student__full_name")
+    list_filter = ("direction", "timestamp")
+    list_select_related = ("student", "recorded_by")
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(DailyMovementRollup)
+class DailyMovementRollupAdmin(admin.ModelAdmin):
+    list_display = ("student", "day", "out_count", "in_count", "first_movement", "last_movement")
+    search_fields = ("student__enrollment_number", "student__full_name")
+    list_filter = ("day",)
+    list_select_related = ("student",)
+    show_full_result_count = False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "created_by", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("result", "error", "started_at", "finished_at")
     
 admin.site.site_header = "GateCheck Admin"
 admin.site.site_title = "GateCheck Admin Portal"
@@ -0,0 +1,171 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+
+from .models import MovementLog, HourlyTraffic, AggregateWatermark
+from . import fragments
+
+WATERMARK = "hourly_traffic"
+HOUR = timedelta(hours=1)
+
+
+def hour_bucket(ts):
+    """Start of the local-time hour containing ts."""
+    return timezone.localtime(ts).replace(minute=0, second=0, microsecond=0)
+
+
+def record_movement(student, direction, now):
+    """
+    Add one scan to its HourlyTraffic row with an F() update. Call it before
+    the MovementLog is written so the student's previous movement is still
+    the latest one.
+    """
+    if direction == MovementLog.OUT:
+        changes = {"out_count": F("out_count") + 1}
+    else:
+        changes = {"in_count": F("in_count") + 1}
+        previous = (
+            MovementLog.objects.filter(student=student, timestamp__lte=now)
+            .order_by("-timestamp", "-id")
+            .values_list("direction", "timestamp")
+            .first()
+        )
+        if previous and previous[0] == MovementLog.OUT:
+            changes["returns"] = F("returns") + 1
+            changes["outside_seconds"] = F("outside_seconds") + int((now - previous[1]).total_seconds())
+
+    key = {"hostel_name": student.hostel_name, "hour": hour_bucket(now)}
+    if HourlyTraffic.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            HourlyTraffic.objects.create(**key)
+    except IntegrityError:
+        pass  # Another scan created the row first
+    HourlyTraffic.objects.filter(**key).update(**changes)
+
+
+def _hour_totals(hour):
+    """Recount one hour from MovementLog: {hostel: HourlyTraffic field values}."""
+    previous = MovementLog.objects.filter(
+        Q(timestamp__lt=OuterRef("timestamp")) | Q(timestamp=OuterRef("timestamp"), id__lt=OuterRef("id")),
+        student=OuterRef("student"),
+    ).order_by("-timestamp", "-id")
+    rows = (
+        MovementLog.objects.filter(timestamp__gte=hour, timestamp__lt=hour + HOUR)
+        .annotate(
+            previous_direction=Subquery(previous.values("direction")[:1]),
+            previous_timestamp=Subquery(previous.values("timestamp")[:1]),
+        )
+        .values_list("student__hostel_name", "direction", "timestamp", "previous_direction", "previous_timestamp")
+    )
+
+    totals = defaultdict(lambda: {"out_count": 0, "in_count": 0, "returns": 0, "outside_seconds": 0})
+    minutes = defaultdict(Counter)
+    for hostel, direction, timestamp, previous_direction, previous_timestamp in rows:
+        entry = totals[hostel]
+        minutes[hostel][timezone.localtime(timestamp).replace(second=0, microsecond=0)] += 1
+        if direction == MovementLog.OUT:
+            entry["out_count"] += 1
+            continue
+        entry["in_count"] += 1
+        if previous_direction == MovementLog.OUT:
+            entry["returns"] += 1
+            entry["outside_seconds"] += int((timestamp - previous_timestamp).total_seconds())
+
+    for hostel, entry in totals.items():
+        # Earliest minute wins a tie
+        peak_minute, peak_count = max(minutes[hostel].items(), key=lambda item: (item[1], -item[0].timestamp()))
+        entry["peak_minute"] = peak_minute
+        entry["peak_count"] = peak_count
+    return totals
+
+
+@transaction.atomic
+def recompute_hour(hour):
+    """
+    Rewrite every hostel's HourlyTraffic row for one hour from MovementLog.
+    The rows are locked first, so scans racing the recount add on top of it.
+    Recounts can change past hours, so they also replace the report's
+    fragment version.
+    """
+    fragments.bump(fragments.TRAFFIC)
+    existing = {
+        row.hostel_name: row
+        for row in HourlyTraffic.objects.select_for_update().filter(hour=hour)
+    }
+    totals = _hour_totals(hour)
+
+    to_create = []
+    for hostel, values in totals.items():
+        row = existing.pop(hostel, None)
+        if row is None:
+            to_create.append(HourlyTraffic(hostel_name=hostel, hour=hour, **values))
+            continue
+        for name, value in values.items():
+            setattr(row, name, value)
+        row.save(update_fields=list(values))
+    HourlyTraffic.objects.bulk_create(to_create)
+    if existing:
+        HourlyTraffic.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+
+
+def catch_up(batch_size=10000):
+    """
+    Fold MovementLog rows added since the watermark into HourlyTraffic by
+    recounting only the hours they fall in. Returns (logs, hours) processed.
+    """
+    mark, _ = AggregateWatermark.objects.get_or_create(name=WATERMARK)
+    logs = 0
+    hours = set()
+    while True:
+        rows = list(
+            MovementLog.objects.filter(pk__gt=mark.last_log_id)
+            .order_by("pk")
+            .values_list("pk", "timestamp")[:batch_size]
+        )
+        if not rows:
+            break
+        touched = {hour_bucket(timestamp) for _, timestamp in rows}
+        for hour in sorted(touched - hours):
+            recompute_hour(hour)
+        hours |= touched
+        mark.last_log_id = rows[-1][0]
+        mark.save(update_fields=["last_log_id", "updated_at"])
+        logs += len(rows)
+    return logs, len(hours)
+
+
+def traffic_report(since, hostel=None):
+    """Totals per hostel, per hour of day and the busiest hours, read from HourlyTraffic only."""
+    rows = HourlyTraffic.objects.filter(hour__gte=since)
+    if hostel:
+        rows = rows.filter(hostel_name=hostel)
+    sums = {
+        "out_total": Sum("out_count"),
+        "in_total": Sum("in_count"),
+        "returns_total": Sum("returns"),
+        "outside_total": Sum("outside_seconds"),
+    }
+
+    by_hostel = list(rows.values("hostel_name").annotate(**sums).order_by("hostel_name"))
+    by_hour = list(
+        rows.annotate(hour_of_day=ExtractHour("hour"))
+        .values("hour_of_day")
+        .annotate(**sums)
+        .order_by("hour_of_day")
+    )
+    for entry in by_hostel + by_hour:
+        returns = entry["returns_total"]
+        entry["average_outside"] = timedelta(seconds=entry["outside_total"] // returns) if returns else None
+
+    busiest = max((entry["out_total"] + entry["in_total"] for entry in by_hour), default=0)
+    for entry in by_hour:
+        entry["share"] = round(100 * (entry["out_total"] + entry["in_total"]) / busiest) if busiest else 0
+
+    peaks = rows.filter(peak_count__gt=0).order_by("-peak_count", "-hour")[:10]
+    return {"by_hostel": by_hostel, "by_hour": by_hour, "peaks": peaks}
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Student, LeaveRequest
+from .passes import rebuild_current_passes
+from . import fragments, metrics
+
+APPROVE = "approve"
+REJECT = "reject"
+
+# Per-item outcomes reported by bulk_decide()
+SUPERVISOR_APPROVED = "supervisor_approved"
+APPROVED = "approved"
+REJECTED = "rejected"
+SKIPPED = "skipped"
+NOT_FOUND = "not_found"
+
+
+def bulk_decide(ids, action, user, reason="", now=None):
+    """
+    Approve or reject many leave requests in one transaction.
+
+    Rows are locked with select_for_update and written with one UPDATE per
+    outcome. Approval follows the same two stages as approve_leave: a
+    pending request without supervisor sign-off gets it, one that already
+    has it gets the warden's and becomes approved. Only pending requests
+    are touched; anything else is reported as skipped.
+
+    Returns {id: outcome}.
+    """
+    now = now or timezone.now()
+    ids = list(dict.fromkeys(ids))
+
+    with transaction.atomic():
+        locked = (
+            LeaveRequest.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .values_list("pk", "student_id", "status", "supervisor_approved")
+        )
+        outcomes = dict.fromkeys(ids, NOT_FOUND)
+        rows = {}
+        for pk, student_id, status, supervisor_approved in locked:
+            if status == LeaveRequest.STATUS_PENDING:
+                rows[pk] = (student_id, supervisor_approved)
+            else:
+                outcomes[pk] = SKIPPED
+
+        if action == APPROVE:
+            first_stage = [pk for pk, (_, supervisor_approved) in rows.items() if not supervisor_approved]
+            second_stage = [pk for pk, (_, supervisor_approved) in rows.items() if supervisor_approved]
+            LeaveRequest.objects.filter(pk__in=first_stage).update(
+                supervisor_approved=True, supervisor=user, supervisor_approved_at=now
+            )
+            LeaveRequest.objects.filter(pk__in=second_stage).update(
+                warden_approved=True, warden=user, warden_approved_at=now, status=LeaveRequest.STATUS_APPROVED
+            )
+            outcomes.update(dict.fromkeys(first_stage, SUPERVISOR_APPROVED))
+            outcomes.update(dict.fromkeys(second_stage, APPROVED))
+            decided = second_stage
+        elif action == REJECT:
+            LeaveRequest.objects.filter(pk__in=rows).update(
+                status=LeaveRequest.STATUS_REJECTED, rejection_reason=reason or "No reason provided"
+            )
+            outcomes.update(dict.fromkeys(rows, REJECTED))
+            decided = list(rows)
+        else:
+            raise ValueError(f"Unknown action {action!r}")
+
+        fragments.bump(fragments.LEAVES)
+        fragments.bump_students(student_id for student_id, _ in rows.values())
+
+        # Newly approved or rejected passes can change who may leave
+        student_ids = {rows[pk][0] for pk in decided}
+        if student_ids:
+            rebuild_current_passes(Student.objects.filter(pk__in=student_ids), now=now)
+
+    for outcome in outcomes.values():
+        if outcome in (SUPERVISOR_APPROVED, APPROVED, REJECTED):
+            metrics.LEAVE_DECISIONS.inc(decision=outcome)
+    return outcomes
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MovementLog, MovementLogArchive, DailyMovementRollup
+
+LOG_FIELDS = ["id", "student_id", "direction", "timestamp", "recorded_by_id", "note"]
+
+
+def archive_cutoff(keep_months, now=None):
+    """Start of the oldest month kept in the live table (local time)."""
+    now = timezone.localtime(now or timezone.now())
+    month = now.year * 12 + (now.month - 1) - keep_months
+    return timezone.make_aware(datetime(month // 12, month % 12 + 1, 1))
+
+
+def _rollup(rows):
+    """Group archived rows into {(student id, local day): [out, in, first, last]}."""
+    totals = {}
+    for row in rows:
+        key = (row["student_id"], timezone.localdate(row["timestamp"]))
+        entry = totals.setdefault(key, [0, 0, row["timestamp"], row["timestamp"]])
+        if row["direction"] == MovementLog.OUT:
+            entry[0] += 1
+        else:
+            entry[1] += 1
+        entry[2] = min(entry[2], row["timestamp"])
+        entry[3] = max(entry[3], row["timestamp"])
+    return totals
+
+
+def _merge_rollups(totals):
+    """Add one batch's totals onto DailyMovementRollup (a day can span batches)."""
+    students = {student_id for student_id, _ in totals}
+    days = {day for _, day in totals}
+    existing = {
+        (rollup.student_id, rollup.day): rollup
+        for rollup in DailyMovementRollup.objects.filter(student_id__in=students, day__in=days)
+    }
+
+    to_create = []
+    to_update = []
+    for (student_id, day), (out_count, in_count, first, last) in totals.items():
+        rollup = existing.get((student_id, day))
+        if rollup is None:
+            to_create.append(DailyMovementRollup(
+                student_id=student_id, day=day, out_count=out_count, in_count=in_count,
+                first_movement=first, last_movement=last,
+            ))
+            continue
+        rollup.out_count += out_count
+        rollup.in_count += in_count
+        rollup.first_movement = min(rollup.first_movement, first)
+        rollup.last_movement = max(rollup.last_movement, last)
+        to_update.append(rollup)
+
+    DailyMovementRollup.objects.bulk_create(to_create)
+    DailyMovementRollup.objects.bulk_update(
+        to_update, ["out_count", "in_count", "first_movement", "last_movement"]
+    )
+
+
+def archive_logs(before, batch_size=5000, max_batches=None, dry_run=False):
+    """
+    Move MovementLog rows older than `before` into MovementLogArchive and
+    fold them into DailyMovementRollup, batch_size rows per transaction.
+
+    Each batch is copied, rolled up and deleted atomically, so an interrupted
+    run leaves nothing half-moved and the next run carries on. Returns the
+    number of rows archived (or that would be, with dry_run).
+    """
+    pending = MovementLog.objects.filter(timestamp__lt=before)
+    if dry_run:
+        return pending.count()
+
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(pending.order_by("timestamp", "id").values(*LOG_FIELDS)[:batch_size])
+            if not rows:
+                break
+            MovementLogArchive.objects.bulk_create([MovementLogArchive(**row) for row in rows])
+            _merge_rollups(_rollup(rows))
+            MovementLog.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+        archived += len(rows)
+        batches += 1
+    return archived
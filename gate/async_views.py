@@ -0,0 +1,200 @@
+"""
+Async versions of the gate views, routed instead of their gate.views
+counterparts when settings.GATE_ASYNC_VIEWS is on (config/asgi.py turns
+it on). Lookups use the async ORM; the toggle transaction and template
+rendering still run in a thread through sync_to_async.
+"""
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, permission_required
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .models import Student
+from .scanning import NoActivePass, StaleScan, claim_scan_key, get_active_pass, remember_scan, toggle_student
+from .views import _expected_inside, _idempotency_key
+from . import live
+from .budgets import query_budget
+
+arender = sync_to_async(render)
+aget_active_pass = sync_to_async(get_active_pass)
+atoggle_student = sync_to_async(toggle_student)
+aclaim_scan_key = sync_to_async(claim_scan_key)
+aremember_scan = sync_to_async(remember_scan)
+
+
+async def _afind_student(enrollment_number):
+    return await Student.objects.select_related("current_pass").with_enrollment(enrollment_number).afirst()
+
+
+@query_budget(3)
+@login_required
+async def check(request):
+    query = request.POST.get("enrollment_number") or request.GET.get("enr")
+    query = query.strip() if query else None
+
+    student = None
+    results = None
+    active_leave = None
+    searched = False
+
+    if query:
+        searched = True
+        try:
+            student = await Student.objects.select_related("current_pass").with_enrollment(query).aget()
+        except Student.DoesNotExist:
+            results = [
+                s async for s in Student.objects.select_related("current_pass").filter(
+                    Q(enrollment_number__icontains=query) | Q(full_name__icontains=query)
+                )[:20]
+            ]
+            if len(results) == 1:
+                student = results[0]
+                results = None
+
+        if student:
+            active_leave = await aget_active_pass(student)
+
+    return await arender(request, "gate/check.html", {
+        "searched": searched,
+        "student": student,
+        "results": results,
+        "active_leave": active_leave,
+        "scan_key": uuid.uuid4().hex,
+    })
+
+
+@query_budget(13)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_http_methods(["POST"])
+async def toggle_status(request):
+    enrollment = request.POST.get("enrollment_number", "").strip()
+    note = request.POST.get("note", "").strip()
+    key = _idempotency_key(request)
+    try:
+        student = await Student.objects.select_related("current_pass").aget(enrollment_number=enrollment)
+    except Student.DoesNotExist:
+        raise Http404
+    back = f"/gate/check/?enr={student.enrollment_number}"
+
+    user = await request.auser()
+    if key and not (await aclaim_scan_key(user, key))[0]:
+        messages.info(request, "This scan was already submitted.")
+        return redirect(back)
+
+    try:
+        log, _ = await atoggle_student(student, user=user, note=note, expected_inside=_expected_inside(request))
+    except NoActivePass:
+        if key:
+            await aremember_scan(user, key, None)
+        messages.error(request, "No active approved leave or outpass.")
+        return redirect(back)
+    except StaleScan:
+        if key:
+            await aremember_scan(user, key, None)
+        await student.arefresh_from_db(fields=["is_inside"])
+        messages.warning(request, f"{student.full_name} is already marked {'IN' if student.is_inside else 'OUT'}.")
+        return redirect(back)
+
+    if key:
+        await aremember_scan(user, key, {"direction": log.direction})
+    messages.success(request, f"{student.full_name} marked {log.direction}.")
+    return redirect(back)
+
+
+@query_budget(13)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_http_methods(["POST"])
+async def scan(request):
+    enrollment = request.POST.get("enrollment_number", "").strip()
+    note = request.POST.get("note", "").strip()
+    key = _idempotency_key(request)
+    if not enrollment:
+        return JsonResponse({"ok": False, "error": "missing_enrollment_number"}, status=400)
+
+    user = await request.auser()
+    if key:
+        first, previous = await aclaim_scan_key(user, key)
+        if not first:
+            if previous is None:
+                return JsonResponse({"ok": False, "error": "in_progress"}, status=409)
+            return JsonResponse({**previous, "duplicate": True})
+
+    student = await _afind_student(enrollment)
+    if student is None:
+        if key:
+            await aremember_scan(user, key, None)
+        return JsonResponse({"ok": False, "error": "not_found", "enrollment_number": enrollment}, status=404)
+
+    payload = {
+        "enrollment_number": student.enrollment_number,
+        "name": student.full_name,
+        "hostel": student.hostel_name,
+        "room": student.room_number,
+    }
+    try:
+        log, active_pass = await atoggle_student(
+            student, user=user, note=note, expected_inside=_expected_inside(request)
+        )
+    except (NoActivePass, StaleScan) as exc:
+        if key:
+            await aremember_scan(user, key, None)
+        if isinstance(exc, StaleScan):
+            await student.arefresh_from_db(fields=["is_inside"])
+            payload.update({"ok": False, "error": "stale", "is_inside": student.is_inside})
+            return JsonResponse(payload, status=409)
+        payload.update({"ok": False, "error": "no_active_pass", "is_inside": student.is_inside})
+        return JsonResponse(payload, status=403)
+
+    payload.update({
+        "ok": True,
+        "direction": log.direction,
+        "is_inside": student.is_inside,
+        "timestamp": log.timestamp.isoformat(),
+        "pass": {
+            "type": active_pass.request_type,
+            "valid_until": active_pass.to_date.isoformat(),
+        } if active_pass else None,
+    })
+    if key:
+        await aremember_scan(user, key, payload)
+    return JsonResponse(payload)
+
+
+@query_budget(1)
+@csrf_exempt
+@require_http_methods(["POST"])
+async def api_check(request):
+    enr = request.POST.get("enrollment_number", "").strip()
+    try:
+        s = await Student.objects.with_enrollment(enr).aget()
+        return JsonResponse({"found": True, "name": s.full_name, "is_inside": s.is_inside})
+    except Student.DoesNotExist:
+        return JsonResponse({"found": False}, status=404)
+
+
+@query_budget(1)
+@login_required
+@permission_required("gate.can_approve_leave", raise_exception=True)
+async def live_feed(request):
+    after = live.last_event_id(request)
+
+    async def stream():
+        subscriber = live.AsyncSubscriber()
+        live.broadcaster.subscribe(subscriber, after)
+        try:
+            yield f"retry: {live.RETRY_MS}\n\n"
+            while not subscriber.dropped:
+                message = await subscriber.get(timeout=live.KEEPALIVE_SECONDS)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            live.broadcaster.unsubscribe(subscriber)
+
+    return live.event_stream_response(stream())
@@ -0,0 +1,274 @@
+import http.client
+import itertools
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import Group, Permission, User
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from .models import Student
+from .seeding import ENROLLMENT_PREFIX, seeded_students
+
+GUARD = "guard"
+WARDEN = "warden"
+STUDENT = "student"
+
+PERCENTILES = (50, 95, 99)
+
+
+class Scenario:
+    """One endpoint to drive: who calls it and how to build a request."""
+
+    def __init__(self, name, role, method, build):
+        self.name = name
+        self.role = role
+        self.method = method
+        self.build = build
+
+    def request(self, rng, enrollments):
+        """Return (path, data) for one request."""
+        return self.build(rng, enrollments)
+
+
+def _enrollment_form(rng, enrollments):
+    return {"enrollment_number": rng.choice(enrollments)}
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("check", GUARD, "GET", lambda rng, e: (reverse("check"), {"enr": rng.choice(e)})),
+        Scenario("toggle_status", GUARD, "POST", lambda rng, e: (reverse("gate_toggle"), _enrollment_form(rng, e))),
+        Scenario("home", WARDEN, "GET", lambda rng, e: (reverse("home"), {})),
+        Scenario("approval_dashboard", WARDEN, "GET", lambda rng, e: (reverse("approval_dashboard"), {})),
+        Scenario("student_dashboard", STUDENT, "GET", lambda rng, e: (reverse("student_dashboard"), {})),
+        Scenario("api_check", None, "POST", lambda rng, e: (reverse("api_check"), _enrollment_form(rng, e))),
+    ]
+}
+
+
+def _grant(user, *codenames):
+    user.user_permissions.add(*Permission.objects.filter(content_type__app_label="gate", codename__in=codenames))
+
+
+def benchmark_users():
+    """
+    Get or create the users the scenarios run as. Returns {role: User}.
+
+    bench_student is linked to a seeded student, never to a real one.
+    """
+    if not seeded_students().exists():
+        raise ValueError(f"No seeded students ({ENROLLMENT_PREFIX}*) to benchmark against; run seed_data first.")
+
+    guard, _ = User.objects.get_or_create(username="bench_guard")
+    guard.groups.add(Group.objects.get_or_create(name="Guard")[0])
+    _grant(guard, "can_toggle_status")
+
+    warden, _ = User.objects.get_or_create(username="bench_warden", defaults={"is_staff": True})
+    _grant(warden, "can_toggle_status", "can_approve_leave", "view_student", "add_student")
+
+    student_user, _ = User.objects.get_or_create(username="bench_student")
+    if not seeded_students().filter(user=student_user).exists():
+        # Release a real student linked by an earlier run; the login is one-to-one
+        Student.objects.filter(user=student_user).update(user=None)
+        student = seeded_students().filter(user__isnull=True).order_by("pk").first()
+        if student is None:
+            raise ValueError("No seeded student without a login to attach bench_student to.")
+        student.user = student_user
+        student.save(update_fields=["user", "updated_at"])
+    return {GUARD: guard, WARDEN: warden, STUDENT: student_user}
+
+
+class ClientTransport:
+    """Requests through Django's test client, in this process."""
+
+    def __init__(self, users):
+        self.users = users
+        self.local = threading.local()
+
+    def _client(self, role):
+        clients = self.local.__dict__.setdefault("clients", {})
+        if role not in clients:
+            client = Client(HTTP_HOST="localhost")
+            if role:
+                client.force_login(self.users[role])
+            clients[role] = client
+        return clients[role]
+
+    def send(self, role, method, path, data):
+        client = self._client(role)
+        response = client.get(path, data) if method == "GET" else client.post(path, data)
+        return response.status_code
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Requests over HTTP to a running server that shares this database."""
+
+    def __init__(self, users, base_url):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.csrf_token = get_random_string(32)
+        self.cookies = {role: self._session_cookie(user) for role, user in users.items()}
+        self.cookies[None] = ""
+        self.local = threading.local()
+
+    def _session_cookie(self, user):
+        # The same session a login would create, without going through the form
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        return f"{settings.SESSION_COOKIE_NAME}={store.session_key}; "
+
+    def send(self, role, method, path, data):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(self.netloc, timeout=30)
+        headers = {"Cookie": f"{self.cookies[role]}{settings.CSRF_COOKIE_NAME}={self.csrf_token}"}
+        body = None
+        if method == "GET":
+            path = f"{path}?{urlencode(data)}" if data else path
+        else:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            headers["X-CSRFToken"] = self.csrf_token
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            connection.close()
+            self.local.connection = None
+            raise
+        return response.status
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _summarize(latencies, errors, elapsed):
+    latencies.sort()
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(latencies, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+    return summary
+
+
+def run(transport, scenarios, requests=200, concurrency=8, warmup=10, seed=42):
+    """
+    Drive the scenarios concurrently, requests times each, in a shuffled
+    order so every scenario runs under the mixed load. Server errors and
+    exceptions count as errors; redirects and 4xx are normal answers here
+    (e.g. a toggle refused for a student without a pass).
+
+    Every scenario targets seeded students only (see gate.seeding), so
+    toggle_status never moves a real student.
+
+    Returns {"elapsed": s, "total": {...}, "scenarios": {name: {...}}} where
+    each summary has requests, errors, throughput, mean_ms and p50/p95/p99_ms.
+    """
+    rng = random.Random(seed)
+    enrollments = list(seeded_students().order_by("pk").values_list("enrollment_number", flat=True)[:5000])
+    if not enrollments:
+        raise ValueError(f"No seeded students ({ENROLLMENT_PREFIX}*) to benchmark against; run seed_data first.")
+
+    work = [scenario for scenario in scenarios for _ in range(requests)]
+    rng.shuffle(work)
+    # Build requests up front so the workers only time the round trip
+    planned = [(scenario, *scenario.request(rng, enrollments)) for scenario in work]
+    warmups = [(scenario, *scenario.request(rng, enrollments)) for scenario in scenarios for _ in range(warmup)]
+
+    results = {scenario.name: ([], [0]) for scenario in scenarios}
+    lock = threading.Lock()
+    queue = iter(planned)
+
+    def send(scenario, path, data):
+        try:
+            return transport.send(scenario.role, scenario.method, path, data) < 500
+        except Exception:
+            return False
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    item = next(queue, None)
+                if item is None:
+                    return
+                scenario, path, data = item
+                start = time.perf_counter()
+                ok = send(scenario, path, data)
+                latency = time.perf_counter() - start
+                latencies, errors = results[scenario.name]
+                with lock:
+                    latencies.append(latency)
+                    if not ok:
+                        errors[0] += 1
+        finally:
+            transport.close()
+
+    for scenario, path, data in warmups:
+        send(scenario, path, data)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    summaries = {name: _summarize(latencies, errors[0], elapsed) for name, (latencies, errors) in results.items()}
+    everything = list(itertools.chain.from_iterable(latencies for latencies, _ in results.values()))
+    total = _summarize(everything, sum(errors[0] for _, errors in results.values()), elapsed)
+    return {"elapsed": round(elapsed, 3), "total": total, "scenarios": summaries}
+
+
+def compare(current, baseline):
+    """
+    Percentage change per scenario against a saved baseline, as
+    {name: {metric: pct}} for throughput and the latency percentiles.
+    A regression is a positive latency change or a negative throughput one.
+    """
+    changes = {}
+    for name, summary in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        row = {}
+        for metric in ["throughput"] + [f"p{pct}_ms" for pct in PERCENTILES]:
+            old, new = before.get(metric), summary.get(metric)
+            if old and new is not None:
+                row[metric] = round((new - old) / old * 100, 1)
+        changes[name] = row
+    return changes
@@ -0,0 +1,18 @@
+def query_budget(max_queries):
+    """
+    Declare the most database queries one request to this view may run,
+    counting everything after the session is loaded: the user lookup, the
+    view's own queries and any writes. Roles are read from the session (see
+    RoleMiddleware), so they cost nothing once warm.
+
+    Put it outermost so the budget sits on the callable the URLconf routes
+    to. QueryBudgetTests in gate/tests.py holds every view to its budget.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def budget_for(view):
+    return getattr(view, "query_budget", None)
@@ -1,9 +1,23 @@
+import zipfile
+
 from django import forms
-from .models import Student, LeaveRequest
+from .models import Student, LeaveRequest, MovementLog
 from django import forms
 from .models import Student
+from .thumbnails import generate_thumbnails
+
+
+class PhotoThumbnailMixin:
+    """Rebuild the photo thumbnails whenever a saved form changed the photo."""
+
+    def save(self, commit=True):
+        instance = super().save(commit=commit)
+        if commit and "photo" in self.changed_data:
+            generate_thumbnails(instance)
+        return instance
 
-class StudentForm(forms.ModelForm):
+
+class StudentForm(PhotoThumbnailMixin, forms.ModelForm):
     class Meta:
         model = Student
         fields = [
@@ -66,7 +80,7 @@ class StudentForm(forms.ModelForm):
             }),
         }
 
-class StudentProfileForm(forms.ModelForm):
+class StudentProfileForm(PhotoThumbnailMixin, forms.ModelForm):
     class Meta:
         model = Student
         fields = [
@@ -84,6 +98,22 @@ class CSVUploadForm(forms.Form):
         })
     )
 
+class PhotoZipUploadForm(forms.Form):
+    file = forms.FileField(
+        help_text="Upload a ZIP of photos named <enrollment_number>.jpg (or .jpeg, .png, .webp)",
+        widget=forms.FileInput(attrs={
+            "accept": ".zip",
+            "class": "block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-0 file:text-sm file:font-semibold file:bg-indigo-50 file:text-indigo-700 hover:file:bg-indigo-100"
+        })
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not zipfile.is_zipfile(upload):
+            raise forms.ValidationError("This is not a ZIP file.")
+        upload.seek(0)
+        return upload
+
 class LeaveRequestForm(forms.ModelForm):
     class Meta:
         model = LeaveRequest
@@ -103,4 +133,18 @@ class LeaveRequestForm(forms.ModelForm):
             "to_date": forms.DateTimeInput(attrs={
                 "type": "datetime-local",
             }),
-        }
\ No newline at end of file
+        }
+
+class LogFilterForm(forms.Form):
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    hostel = forms.ChoiceField(required=False)
+    direction = forms.ChoiceField(
+        required=False, choices=[("", "Any direction")] + MovementLog.DIRECTION_CHOICES
+    )
+    guard = forms.CharField(required=False, widget=forms.TextInput(attrs={"placeholder": "Guard username"}))
+    student = forms.CharField(required=False, widget=forms.TextInput(attrs={"placeholder": "Enrollment number"}))
+
+    def __init__(self, *args, hostels=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["hostel"].choices = [("", "All hostels")] + [(h, h) for h in hostels]
@@ -0,0 +1,59 @@
+"""
+Versions for the {% cache %} fragments on the dashboards.
+
+Each fragment varies on a version that writes replace, so a stale fragment
+is never looked up again and simply expires. Versions are nanosecond
+timestamps rather than counters: a version evicted from the cache comes back
+as a new value instead of restarting at one and matching old fragments.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIX = "gate:fragment-version"
+
+# Global versions
+LEAVES = "leaves"
+# Replaced by HourlyTraffic recounts only; live scans show up through time_bucket()
+TRAFFIC = "traffic"
+
+
+def _key(name):
+    return f"{PREFIX}:{name}"
+
+
+def _student(student_id):
+    return f"student:{student_id}"
+
+
+def version(name):
+    return cache.get_or_set(_key(name), time.time_ns, None)
+
+
+def student_version(student_id):
+    """Changes whenever the student or one of their leave requests is written."""
+    return version(_student(student_id))
+
+
+def time_bucket(now):
+    """
+    Varies fragments that compare against the current time (e.g. "expired"
+    labels) once per FRAGMENT_TIME_BUCKET seconds instead of never.
+    """
+    return int(now.timestamp()) // settings.FRAGMENT_TIME_BUCKET
+
+
+def timeout():
+    return settings.FRAGMENT_CACHE_TIMEOUT
+
+
+def bump(*names):
+    """Give the named versions new values once the current transaction commits."""
+    if names:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(map(_key, names), time.time_ns()), None))
+
+
+def bump_students(student_ids):
+    bump(*{_student(student_id) for student_id in student_ids})
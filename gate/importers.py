@@ -0,0 +1,293 @@
+import csv
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Student
+from . import fragments, lookup, metrics
+from .thumbnails import reencode_from_bytes, delete_thumbnails, store_thumbnails
+
+# Column order for files without a header row (matches CSVUploadForm help text)
+CSV_COLUMNS = [
+    "enrollment_number",
+    "full_name",
+    "course",
+    "year",
+    "room_number",
+    "phone",
+    "hostel_name",
+    "guardian_name",
+    "emergency_phone",
+]
+REQUIRED_COLUMNS = ["enrollment_number", "full_name"]
+YEARS = {value for value, _ in Student.YEAR_CHOICES}
+
+
+class ImportReport:
+    """Counts and per-row errors for one student import."""
+
+    MAX_ERRORS = 500
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.unchanged + self.failed
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+    def summary(self):
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.failed} failed."
+        )
+
+
+def _iter_rows(fileobj):
+    """
+    Yield (line number, {column: value}) from a binary CSV file, decoding it
+    incrementally. A first row whose first cell mentions "enrollment" is
+    treated as a header and decides the column order.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        reader = csv.reader(text)
+        columns = CSV_COLUMNS
+        first = True
+        for row in reader:
+            cells = [cell.strip() for cell in row]
+            if not any(cells):
+                continue
+            if first:
+                first = False
+                if "enrollment" in cells[0].lower():
+                    columns = [cell.lower().replace(" ", "_") for cell in cells]
+                    continue
+            yield reader.line_num, dict(zip(columns, cells))
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def _clean_row(values):
+    """Return (cleaned values, error message). Blank optional cells are skipped."""
+    cleaned = {}
+    for name in CSV_COLUMNS:
+        value = values.get(name, "")
+        if name in REQUIRED_COLUMNS and not value:
+            return None, f"Missing {name}."
+        if not value:
+            continue
+
+        if name == "year":
+            # Accept "2" as well as "2nd Year"
+            digits = value if value.isdigit() else value[:1]
+            if not digits.isdigit() or int(digits) not in YEARS:
+                return None, f"Invalid year {value!r}."
+            value = int(digits)
+        else:
+            max_length = Student._meta.get_field(name).max_length
+            if len(value) > max_length:
+                return None, f"{name} is longer than {max_length} characters."
+
+        cleaned[name] = value
+    return cleaned, None
+
+
+def _apply_chunk(chunk, report, batch_size):
+    """Diff one chunk of rows against the DB and write it with bulk queries."""
+    existing = Student.objects.in_bulk(list(chunk), field_name="enrollment_number")
+    now = timezone.now()
+
+    to_create = []
+    to_update = []
+    changed_fields = set()
+    for enrollment, values in chunk.items():
+        student = existing.get(enrollment)
+        if student is None:
+            to_create.append(Student(**values))
+            continue
+
+        changed = [name for name, value in values.items() if getattr(student, name) != value]
+        if not changed:
+            report.unchanged += 1
+            continue
+        for name in changed:
+            setattr(student, name, values[name])
+        student.updated_at = now
+        changed_fields.update(changed)
+        to_update.append(student)
+
+    with transaction.atomic():
+        if to_create:
+            Student.objects.bulk_create(to_create, batch_size=batch_size)
+        if to_update:
+            Student.objects.bulk_update(to_update, sorted(changed_fields) + ["updated_at"], batch_size=batch_size)
+        # Bulk writes skip post_save; new rows may have a cached "not found"
+        lookup.invalidate([student.enrollment_number for student in to_create + to_update])
+        fragments.bump_students([student.pk for student in to_update])
+
+    report.inserted += len(to_create)
+    report.updated += len(to_update)
+
+
+def import_students(fileobj, batch_size=500, progress=None):
+    """
+    Stream a student CSV from a binary file object and upsert it in batches.
+
+    Each chunk of rows costs one SELECT plus one bulk INSERT/UPDATE, so
+    memory and query count stay proportional to batch_size, not file size.
+    progress, if given, is called with the report after every chunk.
+    """
+    report = ImportReport()
+    chunk = {}
+    counted = {}
+
+    def flush():
+        nonlocal counted
+        _apply_chunk(chunk, report, batch_size)
+        chunk.clear()
+        counted = metrics.record_import("students", counted, report)
+        if progress:
+            progress(report)
+
+    for line, values in _iter_rows(fileobj):
+        cleaned, error = _clean_row(values)
+        if error:
+            report.add_error(line, error)
+            continue
+
+        enrollment = cleaned["enrollment_number"]
+        if enrollment in chunk:
+            # Later rows win; flush so the earlier one is applied first
+            flush()
+        chunk[enrollment] = cleaned
+
+        if len(chunk) >= batch_size:
+            flush()
+
+    if chunk:
+        flush()
+    metrics.record_import("students", counted, report)
+    return report
+
+
+PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+PHOTO_MAX_BYTES = 20 * 1024 * 1024
+
+
+def _photo_members(archive, report):
+    """Yield (enrollment key, ZipInfo) for the image files in a ZIP, skipping the rest."""
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        stem, ext = os.path.splitext(name)
+        if info.is_dir() or not stem or name.startswith(".") or "__MACOSX" in info.filename:
+            continue
+        if ext.lower() not in PHOTO_EXTENSIONS:
+            report.add_error(info.filename, "Not an image file.")
+        elif info.file_size > PHOTO_MAX_BYTES:
+            report.add_error(info.filename, "File is too large.")
+        else:
+            yield stem.strip().upper(), info
+
+
+def _apply_photo_chunk(archive, chunk, pool, report):
+    """Match one chunk of ZIP members to students, re-encode them in the pool and save."""
+    students = {
+        student.enrollment_number.upper(): student
+        for student in Student.objects.with_enrollments(chunk).only(
+            "pk", "enrollment_number", "photo", "photo_thumbnails"
+        )
+    }
+
+    items = []
+    for key, info in chunk.items():
+        if key not in students:
+            report.add_error(info.filename, "No student with this enrollment number.")
+            continue
+        # Only this chunk's members are held in memory at once
+        items.append((key, archive.read(info)))
+
+    now = timezone.now()
+    updated = []
+    stale_files = []
+    for key, result in pool.map(reencode_from_bytes, items):
+        if isinstance(result, str):
+            report.add_error(chunk[key].filename, f"Unreadable image: {result}")
+            continue
+        student = students[key]
+        photo, thumbnails = result
+        name = default_storage.save(f"student_photos/{student.enrollment_number}.jpg", ContentFile(photo))
+        names = store_thumbnails(name, thumbnails)
+        stale_files.append((student.photo.name, student.photo_thumbnails or {}, names))
+        student.photo = name
+        student.photo_thumbnails = names
+        student.updated_at = now
+        updated.append(student)
+
+    with transaction.atomic():
+        Student.objects.bulk_update(updated, ["photo", "photo_thumbnails", "updated_at"])
+        fragments.bump_students([student.pk for student in updated])
+    report.updated += len(updated)
+
+    for old_photo, old_thumbnails, names in stale_files:
+        if old_photo:
+            default_storage.delete(old_photo)
+        delete_thumbnails(old_thumbnails, keep=names)
+
+
+def import_photos(fileobj, batch_size=50, workers=None, progress=None):
+    """
+    Set student photos from a ZIP of <enrollment_number>.jpg files.
+
+    Members are read straight out of the archive one chunk at a time, so
+    memory is bounded by batch_size photos however big the ZIP is. Each
+    chunk costs one student lookup and one bulk UPDATE; decoding, resizing
+    and thumbnailing run in a process pool.
+    """
+    report = ImportReport()
+    chunk = {}
+    counted = {}
+
+    with zipfile.ZipFile(fileobj) as archive, ProcessPoolExecutor(max_workers=workers) as pool:
+        def flush():
+            nonlocal counted
+            _apply_photo_chunk(archive, chunk, pool, report)
+            chunk.clear()
+            counted = metrics.record_import("photos", counted, report)
+            if progress:
+                progress(report)
+
+        for key, info in _photo_members(archive, report):
+            if key in chunk:
+                report.add_error(chunk[key].filename, "Duplicate photo; the later file was used.")
+            chunk[key] = info
+            if len(chunk) >= batch_size:
+                flush()
+        if chunk:
+            flush()
+    metrics.record_import("photos", counted, report)
+    return report
@@ -0,0 +1,111 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+from .importers import import_photos, import_students
+from . import occupancy
+
+logger = logging.getLogger(__name__)
+
+# kind -> callable(job) returning the JSON result
+HANDLERS = {}
+
+STALE_JOB_ERROR = "The worker stopped before the job finished. Upload the file again to retry."
+
+
+
+def register(kind):
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, upload=None, user=None):
+    job = Job(kind=kind, created_by=user)
+    if upload is not None:
+        job.upload.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def set_progress(job, value):
+    job.progress = value
+    Job.objects.filter(pk=job.pk).update(progress=value)
+
+
+def claim_next_job():
+    """
+    Atomically take the oldest queued job. skip_locked lets several workers
+    poll the same table without blocking on each other's claims.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_QUEUED)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def reclaim_stale_jobs(timeout=None, now=None):
+    """
+    Fail jobs left running for longer than JOB_TIMEOUT seconds, i.e. by a
+    worker that crashed or was killed. They are not requeued, so a job that
+    kills its worker cannot loop; the upload is kept for a retry.
+    Returns the number of jobs failed.
+    """
+    now = now or timezone.now()
+    timeout = settings.JOB_TIMEOUT if timeout is None else timeout
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING, started_at__lt=now - timedelta(seconds=timeout)
+    ).update(status=Job.STATUS_FAILED, error=STALE_JOB_ERROR, finished_at=now)
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {job.kind!r}")
+        job.result = handler(job) or {}
+        job.status = Job.STATUS_DONE
+    except Exception:
+        logger.exception("Job %s failed", job.pk)
+        job.error = traceback.format_exc()
+        job.status = Job.STATUS_FAILED
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+
+    if job.status == Job.STATUS_DONE and job.upload:
+        job.upload.delete(save=True)
+    return job
+
+
+@register(Job.IMPORT_STUDENTS)
+def _import_students(job):
+    with job.upload.open("rb") as fh:
+        report = import_students(fh, progress=lambda r: set_progress(job, r.processed))
+    set_progress(job, report.processed)
+    if report.inserted or report.updated:
+        occupancy.invalidate()
+    return report.as_dict()
+
+
+@register(Job.IMPORT_PHOTOS)
+def _import_photos(job):
+    with job.upload.open("rb") as fh:
+        report = import_photos(fh, progress=lambda r: set_progress(job, r.processed))
+    set_progress(job, report.processed)
+    return report.as_dict()
@@ -0,0 +1,220 @@
+"""
+In-process fan-out of new MovementLog rows and occupancy changes for the
+live feed (Server-Sent Events), plus poll() for WSGI deployments, where an
+open stream would hold a worker thread for as long as the tab stays open.
+
+One poller thread per process reads MovementLog past a high-water id once
+per tick, and only while someone is listening. Every open dashboard gets
+the same events pushed into its own queue, so N listeners cost one query
+per tick instead of N page renders.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+
+from .models import MovementLog
+from . import occupancy
+
+logger = logging.getLogger(__name__)
+
+BATCH_LIMIT = 200
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000
+BACKLOG_SIZE = 500
+QUEUE_SIZE = 1000
+
+
+def _interval():
+    return getattr(settings, "LIVE_POLL_INTERVAL", 1.0)
+
+
+def last_event_id(request):
+    """The Last-Event-ID a reconnecting EventSource sends, or None."""
+    value = request.headers.get("Last-Event-ID", "")
+    return int(value) if value.isdigit() else None
+
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def format_event(event_id, kind, data):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {kind}", f"data: {json.dumps(data, separators=(',', ':'))}", "", ""]
+    return "\n".join(lines)
+
+
+def _movement(log):
+    student = log.student
+    return {
+        "id": log.pk,
+        "enrollment": student.enrollment_number,
+        "name": student.full_name,
+        "hostel": student.hostel_name,
+        "room": student.room_number,
+        "phone": student.phone,
+        "direction": log.direction,
+        "is_inside": log.direction == MovementLog.IN,
+        "timestamp": log.timestamp.isoformat(),
+    }
+
+
+def _movements_after(after, limit=BATCH_LIMIT):
+    return list(
+        MovementLog.objects.filter(pk__gt=after)
+        .select_related("student")
+        .only(
+            "direction", "timestamp", "student__enrollment_number", "student__full_name",
+            "student__hostel_name", "student__room_number", "student__phone",
+        )
+        .order_by("pk")[:limit]
+    )
+
+
+def poll(after=None):
+    """
+    One round of the feed for clients that poll instead of streaming (WSGI
+    deployments): occupancy plus the movements past `after`. The first call
+    passes no id and only learns where the feed currently ends.
+    """
+    if after is None:
+        movements = []
+        last_id = MovementLog.objects.aggregate(last=Max("id"))["last"] or 0
+    else:
+        logs = _movements_after(after)
+        movements = [_movement(log) for log in logs]
+        last_id = logs[-1].pk if logs else after
+    return {"last_id": last_id, "movements": movements, "occupancy": occupancy.get_occupancy()}
+
+
+class Subscriber:
+    """A blocking queue, for sync (WSGI) streaming views."""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Too slow to keep up; the view ends the stream and the browser reconnects
+            self.dropped = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscriber:
+    """An asyncio queue fed from the poller thread, for async (ASGI) views."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = False
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+    def push(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._high_water = None
+        self._occupancy = None
+        # Recent movement events, replayed to clients that reconnect with Last-Event-ID
+        self._backlog = deque(maxlen=BACKLOG_SIZE)
+
+    def subscribe(self, subscriber, last_event_id=None):
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, message in self._backlog:
+                    if event_id > last_event_id:
+                        subscriber.push(message)
+            if self._occupancy is not None:
+                subscriber.push(format_event(None, "occupancy", self._occupancy))
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gate-live-feed", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _publish(self, message, event_id=None):
+        with self._lock:
+            if event_id is not None:
+                self._backlog.append((event_id, message))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(message)
+
+    def tick(self):
+        """One poll: push movements past the high-water id, then occupancy if it changed."""
+        if self._high_water is None:
+            self._high_water = MovementLog.objects.aggregate(last=Max("id"))["last"] or 0
+
+        logs = _movements_after(self._high_water)
+        for log in logs:
+            self._publish(format_event(log.pk, "movement", _movement(log)), event_id=log.pk)
+        if logs:
+            self._high_water = logs[-1].pk
+
+        counts = occupancy.get_occupancy()
+        if counts != self._occupancy:
+            self._occupancy = counts
+            self._publish(format_event(None, "occupancy", counts))
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        # Start from "now" next time rather than replaying the idle gap
+                        self._thread = None
+                        self._high_water = None
+                        self._occupancy = None
+                        return
+                try:
+                    self.tick()
+                except Exception:
+                    logger.exception("Live feed poll failed")
+                finally:
+                    close_old_connections()
+                time.sleep(_interval())
+        finally:
+            connection.close()
+
+
+broadcaster = Broadcaster()
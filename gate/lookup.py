@@ -0,0 +1,99 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Student
+
+CACHE_PREFIX = "gate:lookup:v2"
+MISSING = {"found": False}
+
+
+def _timeout():
+    return getattr(settings, "LOOKUP_CACHE_TIMEOUT", 0)
+
+
+def normalize(enrollment_number):
+    return str(enrollment_number or "").strip().upper()
+
+
+def _key(normalized):
+    return f"{CACHE_PREFIX}:{md5(normalized.encode('utf-8')).hexdigest()}"
+
+
+def _entry(student):
+    """
+    The cached, time-independent part of a lookup result: only what a
+    scanner needs to allow or deny (the name lets the guard match the face).
+    """
+    leave = student.current_pass
+    return {
+        "found": True,
+        "enrollment_number": student.enrollment_number,
+        "name": student.full_name,
+        "is_inside": student.is_inside,
+        "pass": {
+            "type": leave.request_type,
+            "valid_from": student.pass_valid_from.isoformat(),
+            "valid_until": student.pass_valid_until.isoformat(),
+        } if leave else None,
+    }
+
+
+def _with_validity(entry, now):
+    # Pass validity depends on the clock, so it is worked out per response
+    entry = dict(entry)
+    if entry.get("pass"):
+        valid_from = parse_datetime(entry["pass"]["valid_from"])
+        valid_until = parse_datetime(entry["pass"]["valid_until"])
+        entry["pass"] = {
+            "type": entry["pass"]["type"],
+            "valid_until": entry["pass"]["valid_until"],
+            "active": valid_from <= now <= valid_until,
+        }
+    if entry["found"]:
+        entry["can_exit"] = bool(entry["pass"] and entry["pass"]["active"])
+    return entry
+
+
+def lookup_students(enrollment_numbers, now=None):
+    """
+    Resolve enrollment numbers (case-insensitive) to lookup results, in input order.
+
+    Results are read through the cache; all misses are fetched with one IN
+    query over the UPPER() index and cached, unknown numbers included. With
+    LOOKUP_CACHE_TIMEOUT at 0 the cache is skipped.
+    """
+    now = now or timezone.now()
+    timeout = _timeout()
+    normalized = [normalize(value) for value in enrollment_numbers]
+    keys = {value: _key(value) for value in normalized if value}
+
+    cached = cache.get_many(list(keys.values())) if timeout else {}
+    entries = {value: cached[key] for value, key in keys.items() if key in cached}
+
+    misses = [value for value in keys if value not in entries]
+    if misses:
+        fetched = {
+            student.enrollment_number.upper(): _entry(student)
+            for student in Student.objects.select_related("current_pass").with_enrollments(misses)
+        }
+        fresh = {value: fetched.get(value, MISSING) for value in misses}
+        if timeout:
+            cache.set_many({keys[value]: entry for value, entry in fresh.items()}, timeout)
+        entries.update(fresh)
+
+    return [
+        {"query": original, **_with_validity(entries.get(value, MISSING), now)}
+        for original, value in zip(enrollment_numbers, normalized)
+    ]
+
+
+def invalidate(enrollment_numbers):
+    """Drop cached lookups once the current transaction commits."""
+    keys = [_key(normalize(value)) for value in enrollment_numbers if normalize(value)]
+    if keys and _timeout():
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from gate.analytics import catch_up
+
+
+class Command(BaseCommand):
+    help = "Recount hourly traffic for the hours touched by logs added since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        logs, hours = catch_up(batch_size=options["batch_size"])
+        self.stdout.write(f"Processed {logs} log(s); recounted {hours} hour(s).")
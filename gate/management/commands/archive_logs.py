@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from gate.archiving import archive_cutoff, archive_logs
+
+
+class Command(BaseCommand):
+    help = "Move movement logs from closed months into the archive table and daily rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, default=3,
+            help="Closed months to keep in the live table besides the current one.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--max-batches", type=int, default=None,
+            help="Stop after this many batches; the rest is picked up by the next run.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would move.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(max(options["keep_months"], 0))
+        count = archive_logs(
+            cutoff,
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+            dry_run=options["dry_run"],
+        )
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(f"{verb} {count} log(s) older than {cutoff:%Y-%m-%d}.")
@@ -0,0 +1,90 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gate import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the hot views concurrently and report throughput and p50/p95/p99 latency. "
+        "Only seeded students (see seed_data) are targeted; toggle_status moves them IN/OUT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario", action="append", choices=sorted(benchmark.SCENARIOS), dest="scenarios",
+            help="Scenario to run; repeat for several (default: all).",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario first.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--url", default=None,
+            help="Base URL of a running server using this database; default is the in-process test client.",
+        )
+        parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="PATH", help="Compare against a saved JSON baseline.")
+        parser.add_argument(
+            "--max-regression", type=float, default=None, metavar="PCT",
+            help="With --compare, fail if any scenario's p95 got more than PCT percent slower.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [benchmark.SCENARIOS[name] for name in options["scenarios"] or benchmark.SCENARIOS]
+        try:
+            users = benchmark.benchmark_users()
+            if options["url"]:
+                transport = benchmark.HttpTransport(users, options["url"])
+            else:
+                transport = benchmark.ClientTransport(users)
+            results = benchmark.run(
+                transport,
+                scenarios,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+                seed=options["seed"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self._print(results)
+        results["meta"] = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "transport": options["url"] or "test-client",
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "seed": options["seed"],
+        }
+        if options["save"]:
+            with open(options["save"], "w") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Saved baseline to {options['save']}.")
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                changes = benchmark.compare(results, json.load(fh))
+            self._print_changes(changes)
+            limit = options["max_regression"]
+            regressed = [name for name, row in changes.items() if limit is not None and row.get("p95_ms", 0) > limit]
+            if regressed:
+                raise CommandError(f"p95 regressed more than {limit}% for: {', '.join(regressed)}")
+
+    def _print(self, results):
+        header = f"{'scenario':<20} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        self.stdout.write(header)
+        rows = list(results["scenarios"].items()) + [("TOTAL", results["total"])]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<20} {row['requests']:>6} {row['errors']:>5} {row['throughput']:>8} "
+                f"{row['p50_ms'] or '-':>8} {row['p95_ms'] or '-':>8} {row['p99_ms'] or '-':>8}"
+            )
+        self.stdout.write(f"Elapsed {results['elapsed']}s")
+
+    def _print_changes(self, changes):
+        self.stdout.write(f"{'vs baseline':<20} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name, row in changes.items():
+            cells = [row.get(metric) for metric in ("throughput", "p50_ms", "p95_ms", "p99_ms")]
+            self.stdout.write(f"{name:<20} " + " ".join(f"{'-' if c is None else f'{c:+.1f}%':>8}" for c in cells))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from gate.models import Student
+from gate.thumbnails import backfill_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Generate photo thumbnails for existing students, rendering in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+        parser.add_argument("--chunk-size", type=int, default=50)
+        parser.add_argument("--all", action="store_true", help="Rebuild students that already have thumbnails too.")
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if not options["all"]:
+            students = students.filter(photo_thumbnails={})
+        built, failed = backfill_thumbnails(
+            students,
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            log=lambda line: self.stderr.write(line),
+        )
+        self.stdout.write(f"Built thumbnails for {built} student(s); {failed} failed.")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from gate.passes import expire_passes
+
+
+class Command(BaseCommand):
+    help = "Expire approved leaves/outpasses past their end time. Safe to run every minute."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--max-batches", type=int, default=None,
+            help="Stop after this many UPDATE batches; the rest is picked up by the next run.",
+        )
+
+    def handle(self, *args, **options):
+        expired, repointed = expire_passes(
+            batch_size=options["batch_size"], max_batches=options["max_batches"]
+        )
+        self.stdout.write(f"Expired {expired} pass(es); repointed {repointed} student(s).")
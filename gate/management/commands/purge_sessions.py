@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from gate.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in batches. Safe to run every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--max-batches", type=int, default=None,
+            help="Stop after this many DELETE batches; the rest is picked up by the next run.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_sessions(
+            batch_size=options["batch_size"], max_batches=options["max_batches"]
+        )
+        self.stdout.write(f"Deleted {deleted} expired session(s).")
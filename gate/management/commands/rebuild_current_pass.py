@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gate.models import Student
+from gate.passes import rebuild_current_passes
+
+
+class Command(BaseCommand):
+    help = "Verify or rebuild the denormalized Student.current_pass against LeaveRequest."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report mismatches; exit with an error if any are found.",
+        )
+        parser.add_argument(
+            "--stale-only", action="store_true",
+            help="Only look at students whose current pass has already ended (sweeper mode).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        queryset = Student.objects.all()
+        if options["stale_only"]:
+            queryset = queryset.filter(pass_valid_until__lt=now)
+
+        mismatches = rebuild_current_passes(
+            queryset, now=now, batch_size=options["batch_size"], dry_run=options["check"]
+        )
+
+        for student_id, stored, expected in mismatches[:50]:
+            self.stdout.write(f"student {student_id}: pass {stored[0]} -> {expected[0]}")
+
+        if options["check"]:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} student(s) have an inconsistent current pass.")
+            self.stdout.write(self.style.SUCCESS("Current passes are consistent."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatches)} student(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from gate.occupancy import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount per-hostel occupancy from the database and refresh the cached counters."
+
+    def handle(self, *args, **options):
+        summary = reconcile()
+        for hostel in summary["hostels"]:
+            self.stdout.write(f"{hostel['name']}: {hostel['inside']} inside, {hostel['outside']} outside")
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {summary['inside']} inside, {summary['outside']} outside"
+        ))
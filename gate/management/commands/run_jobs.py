@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gate.jobs import claim_next_job, reclaim_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (CSV imports, exports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--max-jobs", type=int, default=0, help="Exit after this many jobs (0 = no limit).")
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                # Idle: fail jobs whose worker died mid-run
+                failed = reclaim_stale_jobs()
+                if failed:
+                    self.stdout.write(self.style.WARNING(f"Failed {failed} job(s) left running by a stopped worker"))
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            run_job(job)
+            done += 1
+            style = self.style.SUCCESS if job.status == job.STATUS_DONE else self.style.ERROR
+            self.stdout.write(style(f"{job} finished"))
+
+            if options["max_jobs"] and done >= options["max_jobs"]:
+                break
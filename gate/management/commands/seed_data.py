@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gate import seeding
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic students, movement logs and leave requests at production-like volume."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=20000)
+        parser.add_argument("--logs", type=int, default=2000000)
+        parser.add_argument("--leaves", type=int, default=200000)
+        parser.add_argument("--hostels", type=int, default=8)
+        parser.add_argument("--days", type=int, default=180, help="How far back the movement history goes.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--flush", action="store_true", help="Delete previously seeded rows first.")
+
+    def handle(self, *args, **options):
+        if options["students"] < 1 or not 1 <= options["hostels"] <= 26:
+            raise CommandError("Need at least one student and between 1 and 26 hostels.")
+        if options["flush"]:
+            self.stdout.write(f"Deleted {seeding.flush()} seeded student(s).")
+        elif seeding.seeded_students().exists():
+            raise CommandError("Seeded data already exists; pass --flush to replace it.")
+
+        counts = seeding.seed(
+            students=options["students"],
+            logs=options["logs"],
+            leaves=options["leaves"],
+            hostels=options["hostels"],
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            log=lambda line: self.stderr.write(line),
+        )
+        self.stdout.write(
+            f"Seeded {counts['students']} students, {counts['logs']} movement logs and "
+            f"{counts['leaves']} leave requests. Run aggregate_traffic to fill the analytics tables."
+        )
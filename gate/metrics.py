@@ -0,0 +1,236 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Everything is aggregated in memory under a lock; nothing is written per
+request. Each worker process keeps its own numbers, so scrape every process
+(or sum them in Prometheus). Import row counts are the exception: imports
+run in the run_jobs worker, so they are kept as cache counters, which only
+a shared cache (REDIS_URL) makes visible to the web workers.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SHARED_PREFIX = "gate:metrics"
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with _lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        # Only the matching bucket is bumped; samples() makes them cumulative
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts, total = self._values.get(key, (None, 0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with _lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(float(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(float(total))}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class SharedCounter:
+    """
+    A counter kept in the cache, for work done outside the web processes.
+
+    Needs a cache shared with those processes: unless
+    METRICS_SHARED_COUNTERS is on, inc() does nothing and the metric is
+    left out of /metrics, rather than reported as a constant 0.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames, label_values):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.label_values = [tuple(values) for values in label_values]
+        _registry.append(self)
+
+    @property
+    def enabled(self):
+        return settings.METRICS_SHARED_COUNTERS
+
+    def _key(self, values):
+        return ":".join((SHARED_PREFIX, self.name) + values)
+
+    def inc(self, amount=1, **labels):
+        if not amount or not self.enabled:
+            return
+        key = self._key(tuple(str(labels[name]) for name in self.labelnames))
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+
+    def samples(self):
+        stored = cache.get_many([self._key(values) for values in self.label_values])
+        for values in self.label_values:
+            value = stored.get(self._key(values), 0)
+            yield f"{self.name}{_labels(self.labelnames, values)} {value}"
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        if not getattr(metric, "enabled", True):
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# =========================================================
+# REQUEST METRICS
+# =========================================================
+REQUEST_LATENCY = Histogram(
+    "gate_request_duration_seconds", "Time to produce a response, by URL name.", ["view", "method"]
+)
+REQUEST_QUERIES = Histogram(
+    "gate_request_db_queries", "Database queries per request, by URL name.", ["view"], QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "gate_request_db_duration_seconds", "Time spent in database queries per request, by URL name.", ["view"]
+)
+RESPONSES = Counter("gate_http_responses_total", "Responses by URL name and status code.", ["view", "status"])
+
+_request_stats = contextvars.ContextVar("gate_request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_query_counter(connection):
+    """
+    Add the query counter to a connection. Hooked to connection_created, so it
+    also sees queries that async views run in sync_to_async threads (the
+    request's stats travel there in a context variable).
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def start_request():
+    return _request_stats.set(RequestStats())
+
+
+def finish_request(token, request, response, elapsed):
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    match = getattr(request, "resolver_match", None)
+    view = (match.url_name or match.view_name) if match else "unmatched"
+    REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+    REQUEST_QUERIES.observe(stats.queries, view=view)
+    REQUEST_DB_TIME.observe(stats.db_time, view=view)
+    RESPONSES.inc(view=view, status=response.status_code)
+
+
+# =========================================================
+# BUSINESS METRICS
+# =========================================================
+SCANS = Counter("gate_scans_total", "Recorded gate movements by direction.", ["direction"])
+LEAVE_DECISIONS = Counter(
+    "gate_leave_decisions_total", "Leave/outpass decisions (supervisor_approved, approved, rejected).", ["decision"]
+)
+IMPORT_OUTCOMES = ("inserted", "updated", "unchanged", "failed")
+IMPORT_ROWS = SharedCounter(
+    "gate_import_rows_total",
+    "Rows processed by student and photo imports, by outcome.",
+    ["kind", "outcome"],
+    [(kind, outcome) for kind in ("students", "photos") for outcome in IMPORT_OUTCOMES],
+)
+
+
+def record_import(kind, before, after):
+    """Count the rows an import chunk added to its report (before is a previous as_dict())."""
+    current = after.as_dict()
+    for outcome in IMPORT_OUTCOMES:
+        IMPORT_ROWS.inc(current[outcome] - before.get(outcome, 0), kind=kind, outcome=outcome)
+    return current
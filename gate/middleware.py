@@ -0,0 +1,105 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.middleware import get_user
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics, roles, sessions
+
+
+class RoleMiddleware:
+    """
+    Resolve the user's groups and permissions at most once per request (and
+    usually from the cache) and expose them as request.roles.
+
+    Must come after AuthenticationMiddleware. Loading the user also primes its
+    permission cache, so @permission_required and {{ perms }} run no queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        self.attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.attach(request)
+        return await self.get_response(request)
+
+    def attach(self, request):
+        original_auser = request.auser
+
+        def load_user():
+            # Reuse the user an async view already loaded through auser()
+            user = getattr(request, "_acached_user", None) or get_user(request)
+            roles.roles_for(user)
+            return user
+
+        async def auser():
+            user = await original_auser()
+            await sync_to_async(roles.roles_for)(user)
+            return user
+
+        request.user = SimpleLazyObject(load_user)
+        request.auser = auser
+        request.roles = SimpleLazyObject(lambda: roles.roles_for(request.user))
+
+
+class SessionRefreshMiddleware(MiddlewareMixin):
+    """
+    Sliding session expiry without a write per request: the session is only
+    re-saved (pushing expire_date and the cookie forward) once
+    SESSION_REFRESH_FRACTION of SESSION_COOKIE_AGE has passed.
+
+    Must come after SessionMiddleware so the refresh is saved on the way out.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, "session", None)
+        if session is None or session.is_empty() or session.get_expire_at_browser_close():
+            return response
+        if session.modified or sessions.needs_refresh(session):
+            sessions.refresh(session)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record latency, query count and DB time per URL name into gate.metrics.
+    Goes first in MIDDLEWARE so the timing covers the whole stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = metrics.start_request()
+        start = time.perf_counter()
+        response = self.get_response(request)
+        metrics.finish_request(token, request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        token = metrics.start_request()
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        metrics.finish_request(token, request, response, time.perf_counter() - start)
+        return response
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_current_pass(apps, schema_editor):
+    Student = apps.get_model("gate", "Student")
+    LeaveRequest = apps.get_model("gate", "LeaveRequest")
+    now = timezone.now()
+
+    seen = set()
+    passes = (
+        LeaveRequest.objects.filter(status="approved", to_date__gte=now)
+        .order_by("student_id", "from_date", "id")
+        .values_list("student_id", "id", "from_date", "to_date")
+    )
+    for student_id, pass_id, from_date, to_date in passes.iterator():
+        if student_id in seen:
+            continue
+        seen.add(student_id)
+        Student.objects.filter(pk=student_id).update(
+            current_pass_id=pass_id, pass_valid_from=from_date, pass_valid_until=to_date
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0009_remove_movementlog_linked_request_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='current_pass',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gate.leaverequest'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='pass_valid_from',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='pass_valid_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_current_pass, migrations.RunPython.noop),
+    ]
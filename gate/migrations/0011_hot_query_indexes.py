@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:29
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0010_student_current_pass'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['student', 'status', 'from_date', 'to_date'], name='leave_student_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['student', '-created_at'], name='leave_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', '-created_at'], name='leave_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['student', 'to_date'], name='leave_approved_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['to_date'], name='leave_approved_to_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['-timestamp'], name='log_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['student', '-timestamp'], name='log_student_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('enrollment_number'), name='student_enrollment_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_inside', True)), fields=['enrollment_number'], name='student_inside_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('is_inside', False)), fields=['enrollment_number'], name='student_outside_idx'),
+        ),
+    ]
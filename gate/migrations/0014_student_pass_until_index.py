@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0013_kiosk_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['pass_valid_until'], name='student_pass_until_idx'),
+        ),
+    ]
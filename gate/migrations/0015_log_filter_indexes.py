@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0014_student_pass_until_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['direction', '-timestamp'], name='log_direction_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlog',
+            index=models.Index(fields=['recorded_by', '-timestamp'], name='log_guard_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['hostel_name'], name='student_hostel_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0016_movement_log_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_log_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HourlyTraffic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hostel_name', models.CharField(blank=True, max_length=50)),
+                ('hour', models.DateTimeField()),
+                ('out_count', models.PositiveIntegerField(default=0)),
+                ('in_count', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('outside_seconds', models.BigIntegerField(default=0)),
+                ('peak_minute', models.DateTimeField(blank=True, null=True)),
+                ('peak_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour', 'hostel_name'],
+                'indexes': [models.Index(fields=['hour'], name='traffic_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hostel_name', 'hour'), name='traffic_hostel_hour_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0017_hourly_traffic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='photo_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
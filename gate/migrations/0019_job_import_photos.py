@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gate', '0018_student_photo_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('import_students', 'Import students (CSV)'), ('import_photos', 'Import photos (ZIP)')], max_length=30),
+        ),
+    ]
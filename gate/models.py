@@ -1,7 +1,27 @@
+import os
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+class StudentQuerySet(models.QuerySet):
+    def with_enrollment(self, enrollment_number):
+        """Case-insensitive enrollment match that can use the UPPER() index."""
+        return self.alias(enrollment_key=Upper("enrollment_number")).filter(
+            enrollment_key=(enrollment_number or "").strip().upper()
+        )
+
+    def with_enrollments(self, enrollment_numbers):
+        """Batch form of with_enrollment(): one IN query over the UPPER() index."""
+        keys = {(value or "").strip().upper() for value in enrollment_numbers}
+        return self.alias(enrollment_key=Upper("enrollment_number")).filter(enrollment_key__in=keys)
 
 
 class Student(models.Model):
@@ -11,12 +31,16 @@ class Student(models.Model):
         (3, '3rd Year'),
         (4, '4th Year'),
     ]
+    # Fields that decide which gate.occupancy counter a student is in
+    OCCUPANCY_FIELDS = ("hostel_name", "is_inside")
 
     user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True)
 
     enrollment_number = models.CharField(max_length=32, unique=True)
     full_name = models.CharField(max_length=120)
     photo = models.ImageField(upload_to="student_photos/", blank=True, null=True)
+    # {"96": {"webp": name, "jpeg": name}, "256": {...}}, see gate.thumbnails
+    photo_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     course = models.CharField(max_length=100, blank=True)
     year = models.IntegerField(choices=YEAR_CHOICES, default=1)
@@ -30,11 +54,31 @@ class Student(models.Model):
 
     is_inside = models.BooleanField(default=True)
 
+    # Denormalized copy of the approved pass the gate should honour next,
+    # maintained by gate.passes so gate decisions never scan LeaveRequest.
+    current_pass = models.ForeignKey(
+        "LeaveRequest", null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    pass_valid_from = models.DateTimeField(null=True, blank=True)
+    pass_valid_until = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = StudentQuerySet.as_manager()
+
     class Meta:
         ordering = ["enrollment_number"]
+        indexes = [
+            models.Index(Upper("enrollment_number"), name="student_enrollment_upper_idx"),
+            # Partial indexes back the inside/outside counts and lists
+            models.Index(fields=["enrollment_number"], condition=Q(is_inside=True), name="student_inside_idx"),
+            models.Index(fields=["enrollment_number"], condition=Q(is_inside=False), name="student_outside_idx"),
+            # Kiosk delta sync pages through rows changed since a version
+            models.Index(fields=["updated_at", "id"], name="student_updated_idx"),
+            models.Index(fields=["pass_valid_until"], name="student_pass_until_idx"),
+            models.Index(fields=["hostel_name"], name="student_hostel_idx"),
+        ]
         permissions = [
             ("can_toggle_status", "Can toggle gate IN/OUT"),
             ("can_approve_leave", "Can approve leave requests"),
@@ -43,6 +87,37 @@ class Student(models.Model):
     def __str__(self):
         return f"{self.enrollment_number} - {self.full_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets gate.signals tell whether a save changed the linked login or
+        # moved the student between occupancy counters
+        loaded = dict(zip(field_names, values))
+        instance._loaded_user_id = loaded.get("user_id", models.DEFERRED)
+        instance._loaded_occupancy = tuple(loaded.get(name, models.DEFERRED) for name in cls.OCCUPANCY_FIELDS)
+        return instance
+
+    @cached_property
+    def photo_srcsets(self):
+        """srcset strings for the photo thumbnails, or None until they are built."""
+        if not self.photo_thumbnails:
+            return None
+        srcsets = {}
+        for ext in ("webp", "jpeg"):
+            srcsets[ext] = ", ".join(
+                f"{reverse('photo_thumbnail', args=[os.path.basename(names[ext])])} {size}w"
+                for size, names in sorted(self.photo_thumbnails.items(), key=lambda item: int(item[0]))
+            )
+        largest = max(self.photo_thumbnails, key=int)
+        srcsets["src"] = reverse("photo_thumbnail", args=[os.path.basename(self.photo_thumbnails[largest]["jpeg"])])
+        return srcsets
+
+    def has_active_pass(self, now=None):
+        if self.pass_valid_from is None or self.pass_valid_until is None:
+            return False
+        now = now or timezone.now()
+        return self.pass_valid_from <= now <= self.pass_valid_until
+
 
 class MovementLog(models.Model):
     IN = "IN"
@@ -51,17 +126,115 @@ class MovementLog(models.Model):
 
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="logs")
     direction = models.CharField(max_length=3, choices=DIRECTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     recorded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     note = models.TextField(blank=True)
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp"], name="log_timestamp_idx"),
+            models.Index(fields=["student", "-timestamp"], name="log_student_timestamp_idx"),
+            models.Index(fields=["direction", "-timestamp"], name="log_direction_timestamp_idx"),
+            models.Index(fields=["recorded_by", "-timestamp"], name="log_guard_timestamp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student.enrollment_number} {self.direction}"
 
 
+class MovementLogArchive(models.Model):
+    """MovementLog rows from closed months, moved out of the live table by archive_logs."""
+
+    # Keeps the original MovementLog id so archived and live rows never collide
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="archived_logs")
+    direction = models.CharField(max_length=3, choices=MovementLog.DIRECTION_CHOICES)
+    timestamp = models.DateTimeField()
+    recorded_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    note = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp"], name="archive_timestamp_idx"),
+            models.Index(fields=["student", "-timestamp"], name="archive_student_timestamp_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.student.enrollment_number} {self.direction} (archived)"
+
+
+class DailyMovementRollup(models.Model):
+    """Per-student, per-day movement totals for archived months."""
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="daily_rollups")
+    day = models.DateField()
+    out_count = models.PositiveIntegerField(default=0)
+    in_count = models.PositiveIntegerField(default=0)
+    first_movement = models.DateTimeField()
+    last_movement = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(fields=["student", "day"], name="rollup_student_day_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="rollup_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.student.enrollment_number} {self.day}"
+
+
+class HourlyTraffic(models.Model):
+    """
+    Gate traffic per hostel per local hour, kept up to date on every scan
+    and corrected by the aggregate_traffic command.
+    """
+
+    hostel_name = models.CharField(max_length=50, blank=True)
+    hour = models.DateTimeField()
+    out_count = models.PositiveIntegerField(default=0)
+    in_count = models.PositiveIntegerField(default=0)
+    # INs that closed an OUT, and the total time those trips took
+    returns = models.PositiveIntegerField(default=0)
+    outside_seconds = models.BigIntegerField(default=0)
+    # Filled in by aggregate_traffic
+    peak_minute = models.DateTimeField(null=True, blank=True)
+    peak_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-hour", "hostel_name"]
+        constraints = [
+            models.UniqueConstraint(fields=["hostel_name", "hour"], name="traffic_hostel_hour_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="traffic_hour_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.hostel_name or '-'} {self.hour:%Y-%m-%d %H:00}"
+
+    @property
+    def average_outside(self):
+        if not self.returns:
+            return None
+        return timedelta(seconds=self.outside_seconds // self.returns)
+
+
+class AggregateWatermark(models.Model):
+    """Last MovementLog id folded into an aggregate by its catch-up command."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    last_log_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_log_id}"
+
+
 class LeaveRequest(models.Model):
     OUTPASS = "Outpass"
     LEAVE = "Leave"
@@ -106,6 +279,18 @@ class LeaveRequest(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["student", "status", "from_date", "to_date"], name="leave_student_status_dates_idx"
+            ),
+            models.Index(fields=["student", "-created_at"], name="leave_student_created_idx"),
+            models.Index(fields=["status", "-created_at"], name="leave_status_created_idx"),
+            # Approved passes are the only ones the gate and the sweeper look at
+            models.Index(
+                fields=["student", "to_date"], condition=Q(status="approved"), name="leave_approved_student_idx"
+            ),
+            models.Index(fields=["to_date"], condition=Q(status="approved"), name="leave_approved_to_date_idx"),
+        ]
 
     def clean(self):
         if self.to_date <= self.from_date:
@@ -116,3 +301,51 @@ class LeaveRequest(models.Model):
         now = timezone.now()
         return self.status == self.STATUS_APPROVED and self.from_date <= now <= self.to_date
 
+
+
+class Job(models.Model):
+    """A unit of background work (imports, exports) run by the run_jobs worker."""
+
+    IMPORT_STUDENTS = "import_students"
+    IMPORT_PHOTOS = "import_photos"
+    KIND_CHOICES = [
+        (IMPORT_STUDENTS, "Import students (CSV)"),
+        (IMPORT_PHOTOS, "Import photos (ZIP)"),
+    ]
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    upload = models.FileField(upload_to="jobs/", blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at"], condition=Q(status="queued"), name="job_queued_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
@@ -0,0 +1,89 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Student
+
+CACHE_PREFIX = "gate:occupancy"
+HOSTELS_KEY = f"{CACHE_PREFIX}:hostels"
+
+
+def _timeout():
+    # Counters expire so every deployment reconciles with the DB at least this often
+    return getattr(settings, "OCCUPANCY_CACHE_TIMEOUT", 300)
+
+
+def _key(hostel, inside):
+    digest = md5(hostel.encode("utf-8")).hexdigest()
+    return f"{CACHE_PREFIX}:{digest}:{'in' if inside else 'out'}"
+
+
+def _summary(counts):
+    hostels = [
+        {"name": name or "Unassigned", "inside": inside, "outside": outside}
+        for name, (inside, outside) in sorted(counts.items())
+    ]
+    return {
+        "inside": sum(h["inside"] for h in hostels),
+        "outside": sum(h["outside"] for h in hostels),
+        "hostels": hostels,
+    }
+
+
+def reconcile():
+    """Recount occupancy with one grouped query and overwrite the cached counters."""
+    rows = (
+        Student.objects.order_by()
+        .values("hostel_name")
+        .annotate(inside=Count("id", filter=Q(is_inside=True)), outside=Count("id", filter=Q(is_inside=False)))
+    )
+    counts = {row["hostel_name"]: (row["inside"], row["outside"]) for row in rows}
+
+    values = {HOSTELS_KEY: sorted(counts)}
+    for hostel, (inside, outside) in counts.items():
+        values[_key(hostel, True)] = inside
+        values[_key(hostel, False)] = outside
+    cache.set_many(values, _timeout())
+    return _summary(counts)
+
+
+def get_occupancy():
+    """
+    Overall and per-hostel inside/outside counts, served from the cache.
+    Falls back to reconcile() when any counter is missing.
+    """
+    hostels = cache.get(HOSTELS_KEY)
+    if hostels is None:
+        return reconcile()
+
+    keys = {hostel: (_key(hostel, True), _key(hostel, False)) for hostel in hostels}
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    if len(values) != 2 * len(keys):
+        return reconcile()
+
+    return _summary({hostel: (values[k_in], values[k_out]) for hostel, (k_in, k_out) in keys.items()})
+
+
+def hostel_names():
+    """Known hostel names, from the same cached index as the counters."""
+    hostels = cache.get(HOSTELS_KEY)
+    if hostels is None:
+        reconcile()
+        hostels = cache.get(HOSTELS_KEY, [])
+    return [name for name in hostels if name]
+
+
+def record_move(hostel, is_inside):
+    """Shift one student of `hostel` to the inside (or outside) counter."""
+    try:
+        cache.incr(_key(hostel, is_inside))
+        cache.decr(_key(hostel, not is_inside))
+    except ValueError:
+        # Counter missing (expired, or a hostel we have not seen): recount on next read
+        invalidate()
+
+
+def invalidate():
+    cache.delete(HOSTELS_KEY)
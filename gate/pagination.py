@@ -0,0 +1,149 @@
+import base64
+import binascii
+import heapq
+import itertools
+import json
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, object_list, next_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return "cursor" not in self._params
+
+    @property
+    def next_query(self):
+        """Query string for the next page, keeping the current filters."""
+        params = self._params.copy()
+        params["cursor"] = self.next_cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        params = self._params.copy()
+        params.pop("cursor", None)
+        return params.urlencode()
+
+
+def encode_cursor(values):
+    # isoformat() keeps microseconds; DjangoJSONEncoder would round them off
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, fields):
+    """Return the cursor's values converted to the field types, or None if it is invalid."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+
+    decoded = []
+    for name, value in zip(fields, values):
+        field = model._meta.get_field(name)
+        if isinstance(field, models.DateTimeField):
+            value = parse_datetime(value) if isinstance(value, str) else None
+            if value is None:
+                return None
+        decoded.append(value)
+    return decoded
+
+
+def _after(ordering, values):
+    """Q for rows strictly after `values` in the given ordering (a row-value comparison)."""
+    condition = Q()
+    for index, (name, descending) in enumerate(ordering):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        for prev_index in range(index):
+            step &= Q(**{ordering[prev_index][0]: values[prev_index]})
+        condition |= step
+    return condition
+
+
+def _page_size(request, default_size):
+    size = request.GET.get("size", "")
+    return min(max(int(size), 1), MAX_PAGE_SIZE) if size.isdigit() else default_size
+
+
+def _rows_after_cursor(queryset, ordering, request, limit):
+    """Up to `limit` rows of queryset in `ordering`, starting after ?cursor=."""
+    fields = [name.lstrip("-") for name in ordering]
+    parsed = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get("cursor")
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, fields)
+        if values is not None:
+            queryset = queryset.filter(_after(parsed, values))
+    return list(queryset[:limit])
+
+
+def _build_page(rows, ordering, size, request):
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip("-")) for name in ordering])
+    return KeysetPage(rows, next_cursor, request.GET)
+
+
+def paginate_keyset(queryset, ordering, request, default_size=DEFAULT_PAGE_SIZE):
+    """
+    Paginate by the last row's sort key instead of OFFSET, so every page
+    costs the same index range scan no matter how deep the reader goes.
+
+    `ordering` must end in a unique field (e.g. ("-created_at", "-id")).
+    Reads ?cursor= and ?size= (capped at MAX_PAGE_SIZE) from the request.
+    """
+    size = _page_size(request, default_size)
+    rows = _rows_after_cursor(queryset, ordering, request, size + 1)
+    return _build_page(rows, ordering, size, request)
+
+
+def paginate_keyset_merged(querysets, ordering, request, default_size=DEFAULT_PAGE_SIZE):
+    """
+    Keyset-paginate several querysets with the same sort fields as one list,
+    e.g. live and archived rows. Each source reads one page after the cursor
+    and the pages are merged in memory. All fields must sort the same way.
+    """
+    directions = {name.startswith("-") for name in ordering}
+    if len(directions) != 1:
+        raise ValueError("paginate_keyset_merged needs a single sort direction.")
+
+    size = _page_size(request, default_size)
+    fields = [name.lstrip("-") for name in ordering]
+    rows = heapq.merge(
+        *(_rows_after_cursor(queryset, ordering, request, size + 1) for queryset in querysets),
+        key=lambda row: tuple(getattr(row, name) for name in fields),
+        reverse=directions.pop(),
+    )
+    return _build_page(list(itertools.islice(rows, size + 1)), ordering, size, request)
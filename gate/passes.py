@@ -0,0 +1,111 @@
+from django.utils import timezone
+
+from .models import Student, LeaveRequest
+from . import fragments, lookup
+
+PASS_FIELDS = ["current_pass", "pass_valid_from", "pass_valid_until", "updated_at"]
+
+
+def _upcoming_passes(student_ids, now):
+    """
+    Map student id -> (pass id, from_date, to_date) of the approved pass
+    that has not ended yet and starts first.
+    """
+    passes = {}
+    rows = (
+        LeaveRequest.objects.filter(
+            student_id__in=student_ids,
+            status=LeaveRequest.STATUS_APPROVED,
+            to_date__gte=now,
+        )
+        .order_by("student_id", "from_date", "id")
+        .values_list("student_id", "id", "from_date", "to_date")
+    )
+    for student_id, pass_id, from_date, to_date in rows:
+        passes.setdefault(student_id, (pass_id, from_date, to_date))
+    return passes
+
+
+def refresh_current_pass(student, now=None, save=True):
+    """Recompute student.current_pass from LeaveRequest. Returns True if it changed."""
+    now = now or timezone.now()
+    expected = _upcoming_passes([student.pk], now).get(student.pk, (None, None, None))
+    stored = (student.current_pass_id, student.pass_valid_from, student.pass_valid_until)
+    if stored == expected:
+        return False
+
+    student.current_pass_id, student.pass_valid_from, student.pass_valid_until = expected
+    if save:
+        student.save(update_fields=PASS_FIELDS)
+    return True
+
+
+def rebuild_current_passes(queryset=None, now=None, batch_size=1000, dry_run=False):
+    """
+    Verify (and unless dry_run, repair) the denormalized pass on every student
+    in queryset. Returns a list of (student_id, stored, expected) mismatches.
+    """
+    now = now or timezone.now()
+    queryset = Student.objects.all() if queryset is None else queryset
+    mismatches = []
+
+    last_id = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_id)
+            .order_by("pk")
+            .only("pk", "enrollment_number", "current_pass", "pass_valid_from", "pass_valid_until")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].pk
+
+        expected_by_id = _upcoming_passes([s.pk for s in batch], now)
+        changed = []
+        for student in batch:
+            stored = (student.current_pass_id, student.pass_valid_from, student.pass_valid_until)
+            expected = expected_by_id.get(student.pk, (None, None, None))
+            if stored == expected:
+                continue
+            mismatches.append((student.pk, stored, expected))
+            student.current_pass_id, student.pass_valid_from, student.pass_valid_until = expected
+            student.updated_at = now
+            changed.append(student)
+
+        if changed and not dry_run:
+            Student.objects.bulk_update(changed, PASS_FIELDS)
+            # bulk_update skips post_save, so drop the cached device lookups here
+            lookup.invalidate([student.enrollment_number for student in changed])
+            fragments.bump_students([student.pk for student in changed])
+
+    return mismatches
+
+
+def expire_passes(now=None, batch_size=1000, max_batches=None):
+    """
+    Mark approved passes whose to_date has passed as expired, batch_size rows
+    per UPDATE, then repoint students whose current pass has ended.
+
+    Idempotent and safe to run every minute. Returns (expired, repointed).
+    """
+    now = now or timezone.now()
+    expired = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = list(
+            LeaveRequest.objects.filter(status=LeaveRequest.STATUS_APPROVED, to_date__lt=now)
+            .order_by()
+            .values_list("pk", "student_id")[:batch_size]
+        )
+        if not rows:
+            break
+        expired += LeaveRequest.objects.filter(
+            pk__in=[pk for pk, _ in rows], status=LeaveRequest.STATUS_APPROVED
+        ).update(status=LeaveRequest.STATUS_EXPIRED)
+        fragments.bump(fragments.LEAVES)
+        fragments.bump_students(student_id for _, student_id in rows)
+        batches += 1
+
+    stale = Student.objects.filter(pass_valid_until__lt=now)
+    repointed = len(rebuild_current_passes(stale, now=now, batch_size=batch_size))
+    return expired, repointed
@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Student
+
+GUARD = "Guard"
+SUPERVISOR = "Supervisor"
+
+VERSION_KEY = "gate:roles:version"
+
+
+class Roles:
+    """A user's group names and permissions, resolved once."""
+
+    def __init__(self, groups=(), perms=(), is_superuser=False, is_staff=False, is_student=False):
+        self.groups = frozenset(groups)
+        self.perms = frozenset(perms)
+        self.is_superuser = is_superuser
+        self.is_staff = is_staff
+        # Has a linked Student profile
+        self.is_student = is_student
+
+    @property
+    def is_guard(self):
+        return GUARD in self.groups
+
+    @property
+    def is_supervisor(self):
+        return SUPERVISOR in self.groups
+
+    @property
+    def is_admin_or_warden(self):
+        return self.is_superuser or self.is_staff
+
+    def has_perm(self, perm):
+        return self.is_superuser or perm in self.perms
+
+
+ANONYMOUS = Roles()
+
+
+def current_version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def bump_version():
+    """Invalidate every cached Roles, e.g. after a group or permission change."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, None)
+
+
+def _resolve(user):
+    groups = list(user.groups.values_list("name", flat=True))
+    perms = []
+    if not user.is_superuser:
+        # One query for direct and group permissions, where ModelBackend takes two
+        rows = (
+            Permission.objects.filter(Q(user=user) | Q(group__user=user))
+            .values_list("content_type__app_label", "codename")
+            .distinct()
+        )
+        perms = [f"{app_label}.{codename}" for app_label, codename in rows]
+    is_student = Student.objects.filter(user=user).exists()
+    return Roles(groups, perms, user.is_superuser, user.is_staff, is_student)
+
+
+def _cache_key(user):
+    return f"gate:roles:user:{user.pk}"
+
+
+def _from_cache(user):
+    """Cached roles for user, or (None, current version). One cache round trip."""
+    cached = cache.get_many([VERSION_KEY, _cache_key(user)])
+    version = cached.get(VERSION_KEY) or current_version()
+    data = cached.get(_cache_key(user))
+    if not data or data["version"] != version:
+        return None, version
+    return Roles(data["groups"], data["perms"], user.is_superuser, user.is_staff, data["student"]), version
+
+
+def roles_for(user):
+    """
+    Roles for user, cached on the user object and in the cache backend until
+    the role version is bumped or ROLE_CACHE_SECONDS pass.
+    ROLE_CACHE_SECONDS = 0 turns the shared cache off.
+
+    The cache is not the session on purpose: rewriting the session every
+    ROLE_CACHE_SECONDS would save it far more often than
+    SESSION_REFRESH_FRACTION allows.
+    """
+    if not user.is_authenticated or not user.is_active:
+        return ANONYMOUS
+    roles = getattr(user, "_gate_roles", None)
+    if roles is not None:
+        return roles
+
+    if settings.ROLE_CACHE_SECONDS:
+        roles, version = _from_cache(user)
+        if roles is None:
+            roles = _resolve(user)
+            cache.set(_cache_key(user), {
+                "version": version,
+                "groups": sorted(roles.groups),
+                "perms": sorted(roles.perms),
+                "student": roles.is_student,
+            }, settings.ROLE_CACHE_SECONDS)
+    else:
+        roles = _resolve(user)
+
+    user._gate_roles = roles
+    if not user.is_superuser:
+        # ModelBackend reads these, so has_perm/@permission_required/{{ perms }} skip their
+        # queries. The async path (ahas_perm) reads the per-source caches, and roles only
+        # hold the union, so it all goes under "user".
+        user._perm_cache = set(roles.perms)
+        user._user_perm_cache = set(roles.perms)
+        user._group_perm_cache = set()
+    return roles
@@ -0,0 +1,165 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Student, MovementLog, LeaveRequest
+from .passes import refresh_current_pass
+from . import analytics, fragments, lookup, metrics, occupancy
+
+SCAN_KEY_PREFIX = "gate:scan-key"
+SCAN_PENDING = "pending"
+
+
+class NoActivePass(Exception):
+    """Raised when a student inside campus has no approved leave/outpass."""
+
+
+class StaleScan(Exception):
+    """Raised when the student was moved IN/OUT by another scan first."""
+
+
+def find_student(enrollment_number):
+    """Resolve an enrollment number (case-insensitive) or return None."""
+    enrollment_number = (enrollment_number or "").strip()
+    if not enrollment_number:
+        return None
+    return Student.objects.select_related("current_pass").with_enrollment(enrollment_number).first()
+
+
+def get_active_pass(student, now=None):
+    """
+    Return the pass that lets the student out right now, read from the
+    denormalized Student.current_pass. A pointer that has already ended is
+    refreshed first, in case a later pass is queued behind it.
+    """
+    now = now or timezone.now()
+    if student.pass_valid_until is not None and student.pass_valid_until < now:
+        refresh_current_pass(student, now)
+    if student.has_active_pass(now):
+        return student.current_pass
+    return None
+
+
+def _record_movement(student, direction, user, note, now):
+    """
+    Persist a movement: flip is_inside, expire outpasses on return, bump the
+    hourly traffic aggregate and write the log.
+
+    The flip is a conditional UPDATE on the state the movement starts from,
+    so when two scans of one student race, only the first one applies and
+    the other raises StaleScan. Call inside a transaction.
+    """
+    inside = direction == MovementLog.IN
+    flipped = Student.objects.filter(pk=student.pk, is_inside=not inside).update(
+        is_inside=inside, updated_at=timezone.now()
+    )
+    if not flipped:
+        raise StaleScan(student)
+    student.is_inside = inside
+
+    if direction == MovementLog.IN:
+        # Expire Outpass on return
+        if LeaveRequest.objects.filter(
+            student=student,
+            request_type=LeaveRequest.OUTPASS,
+            status=LeaveRequest.STATUS_APPROVED
+        ).update(status=LeaveRequest.STATUS_EXPIRED, to_date=now):
+            fragments.bump(fragments.LEAVES)
+        if student.current_pass_id is not None:
+            refresh_current_pass(student, timezone.now())
+
+    # The UPDATE above skips post_save, so drop the cached device lookup here
+    lookup.invalidate([student.enrollment_number])
+    fragments.bump_students([student.pk])
+    transaction.on_commit(lambda: occupancy.record_move(student.hostel_name, student.is_inside))
+    transaction.on_commit(lambda: metrics.SCANS.inc(direction=direction))
+    analytics.record_movement(student, direction, now)
+    return MovementLog.objects.create(
+        student=student,
+        direction=direction,
+        recorded_by=user,
+        note=note,
+        timestamp=now
+    )
+
+
+@transaction.atomic
+def toggle_student(student, user=None, note="", expected_inside=None):
+    """
+    Flip a student IN/OUT and write the MovementLog in one transaction.
+
+    Going OUT requires an active approved pass (raises NoActivePass).
+    Coming IN expires any approved outpass. expected_inside is the state
+    the guard saw; if the student has moved since, StaleScan is raised
+    instead of toggling back. Returns (log, active_pass).
+    """
+    now = timezone.now()
+    active_pass = None
+    if expected_inside is not None and expected_inside != student.is_inside:
+        raise StaleScan(student)
+
+    if student.is_inside:
+        active_pass = get_active_pass(student, now)
+        if active_pass is None:
+            raise NoActivePass(student)
+        direction = MovementLog.OUT
+    else:
+        direction = MovementLog.IN
+
+    log = _record_movement(student, direction, user, note, now)
+    return log, active_pass
+
+
+def had_pass_at(student, when):
+    """Whether an approved (possibly since expired) pass covered the given time."""
+    return LeaveRequest.objects.filter(
+        student=student,
+        status__in=[LeaveRequest.STATUS_APPROVED, LeaveRequest.STATUS_EXPIRED],
+        from_date__lte=when,
+        to_date__gte=when
+    ).exists()
+
+
+@transaction.atomic
+def replay_scan(student, direction, timestamp, user=None, note=""):
+    """
+    Apply a scan recorded offline by a kiosk at `timestamp`.
+
+    The movement already happened at the gate, so an OUT without a pass is
+    still recorded, but flagged in the note. Returns (log, flagged).
+    """
+    flagged = direction == MovementLog.OUT and not had_pass_at(student, timestamp)
+    if flagged:
+        note = f"[offline: no active pass] {note}".strip()
+    log = _record_movement(student, direction, user, note, timestamp)
+    return log, flagged
+
+
+def _scan_key(user, key):
+    return f"{SCAN_KEY_PREFIX}:{user.pk}:{md5(key.encode('utf-8')).hexdigest()}"
+
+
+def claim_scan_key(user, key):
+    """
+    Mark an idempotency key as in use by this user. Returns (True, None) for
+    the first submission inside the window, else (False, stored result or
+    None while the first one is still running). One cache round trip.
+    """
+    cache_key = _scan_key(user, key)
+    window = getattr(settings, "SCAN_IDEMPOTENCY_WINDOW", 60)
+    if cache.add(cache_key, SCAN_PENDING, window):
+        return True, None
+    result = cache.get(cache_key)
+    return False, (None if result == SCAN_PENDING else result)
+
+
+def remember_scan(user, key, result):
+    """Store the outcome for duplicates of this key to replay; None frees the key."""
+    cache_key = _scan_key(user, key)
+    if result is None:
+        cache.delete(cache_key)
+    else:
+        cache.set(cache_key, result, getattr(settings, "SCAN_IDEMPOTENCY_WINDOW", 60))
@@ -0,0 +1,171 @@
+import itertools
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Student, MovementLog, LeaveRequest
+from .passes import rebuild_current_passes
+from . import occupancy
+
+ENROLLMENT_PREFIX = "SEED"
+COURSES = ["B.Tech CSE", "B.Tech ECE", "B.Tech ME", "B.Sc Physics", "BBA", "MBA", "M.Tech CSE"]
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Vihaan", "Ananya", "Arjun", "Meera"]
+LAST_NAMES = ["Sharma", "Patel", "Reddy", "Iyer", "Khan", "Singh", "Das", "Nair", "Gupta", "Joshi"]
+DESTINATIONS = ["Home", "Market", "Hospital", "Railway Station", "Airport", "Relative's place"]
+
+# Share of seeded leave requests per status
+STATUS_WEIGHTS = {
+    LeaveRequest.STATUS_PENDING: 10,
+    LeaveRequest.STATUS_APPROVED: 10,
+    LeaveRequest.STATUS_REJECTED: 15,
+    LeaveRequest.STATUS_EXPIRED: 65,
+}
+
+
+def seeded_students():
+    return Student.objects.filter(enrollment_number__startswith=ENROLLMENT_PREFIX)
+
+
+def _split(total, parts, rng):
+    """Spread total over parts as evenly as possible, remainder to random parts."""
+    base, extra = divmod(total, parts)
+    counts = [base] * parts
+    for index in rng.sample(range(parts), extra):
+        counts[index] += 1
+    return counts
+
+
+def _bulk_create(model, objects, batch_size, on_batch=None):
+    """
+    bulk_create from an iterable, one transaction per batch, so memory stays
+    bounded by batch_size. on_batch is called with each created batch.
+    Returns the number of rows created.
+    """
+    objects = iter(objects)
+    count = 0
+    while batch := list(itertools.islice(objects, batch_size)):
+        with transaction.atomic():
+            created = model.objects.bulk_create(batch)
+            if on_batch:
+                on_batch(created)
+        count += len(created)
+    return count
+
+
+def _students(log_counts, hostels, rng):
+    for index, count in enumerate(log_counts):
+        hostel = hostels[index % len(hostels)]
+        yield Student(
+            enrollment_number=f"{ENROLLMENT_PREFIX}{index:06d}",
+            full_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            course=rng.choice(COURSES),
+            year=rng.randint(1, 4),
+            hostel_name=hostel,
+            room_number=f"{hostel[-1]}-{rng.randint(1, 4)}{rng.randint(0, 40):02d}",
+            phone=f"9{rng.randrange(10 ** 9):09d}",
+            # Every student starts inside and alternates OUT/IN, so an even
+            # number of movements leaves them inside
+            is_inside=count % 2 == 0,
+        )
+
+
+def _movements(students, log_counts, days, now, rng):
+    window = days * 86400
+    for student, count in zip(students, log_counts):
+        offsets = sorted(rng.random() * window for _ in range(count))
+        for position, offset in enumerate(offsets):
+            yield MovementLog(
+                student_id=student.pk,
+                direction=MovementLog.OUT if position % 2 == 0 else MovementLog.IN,
+                timestamp=now - timedelta(seconds=window - offset),
+            )
+
+
+def _leave_requests(students, total, days, now, rng):
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    for _ in range(total):
+        status = rng.choices(statuses, weights)[0]
+        request_type = rng.choice([LeaveRequest.OUTPASS, LeaveRequest.LEAVE])
+        length = timedelta(hours=rng.randint(2, 10)) if request_type == LeaveRequest.OUTPASS else timedelta(days=rng.randint(1, 7))
+        if status == LeaveRequest.STATUS_EXPIRED:
+            start = now - timedelta(seconds=rng.random() * days * 86400) - length
+        elif status == LeaveRequest.STATUS_REJECTED:
+            start = now + timedelta(seconds=(rng.random() - 0.8) * days * 86400)
+        else:
+            # Pending and approved passes have not ended yet
+            start = now + timedelta(seconds=rng.random() * 14 * 86400) - length / 2
+        decided = status in (LeaveRequest.STATUS_APPROVED, LeaveRequest.STATUS_EXPIRED)
+        yield LeaveRequest(
+            student_id=rng.choice(students).pk,
+            request_type=request_type,
+            reason="Seeded request",
+            destination=rng.choice(DESTINATIONS),
+            from_date=start,
+            to_date=start + length,
+            supervisor_approved=decided or (status == LeaveRequest.STATUS_PENDING and rng.random() < 0.3),
+            warden_approved=decided,
+            status=status,
+            rejection_reason="Seeded rejection" if status == LeaveRequest.STATUS_REJECTED else None,
+        )
+
+
+def seed(students=20000, logs=2000000, leaves=200000, hostels=8, days=180, seed=42, batch_size=5000, log=None):
+    """
+    Create synthetic students, movement logs and leave requests with
+    bulk_create. The same seed always produces the same data; existing seeded
+    rows (enrollment numbers starting with ENROLLMENT_PREFIX) must be removed
+    first with flush().
+
+    Returns {"students": n, "logs": n, "leaves": n}.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    now = timezone.now()
+    hostel_names = [f"Hostel {chr(ord('A') + index)}" for index in range(hostels)]
+    log_counts = _split(logs, students, rng)
+
+    created = []
+    _bulk_create(Student, _students(log_counts, hostel_names, rng), batch_size, created.extend)
+    log(f"Created {len(created)} students.")
+
+    logged = 0
+
+    def report_logs(batch):
+        nonlocal logged
+        logged += len(batch)
+        if logged % (batch_size * 100) < len(batch):
+            log(f"Created {logged} movement logs...")
+
+    _bulk_create(MovementLog, _movements(created, log_counts, days, now, rng), batch_size, report_logs)
+    log(f"Created {logged} movement logs.")
+
+    def backdate(batch):
+        # auto_now_add stamped the rows with now; date them a day before they start
+        LeaveRequest.objects.filter(pk__in=[leave.pk for leave in batch]).update(
+            created_at=F("from_date") - timedelta(days=1)
+        )
+
+    requested = _bulk_create(LeaveRequest, _leave_requests(created, leaves, days, now, rng), batch_size, backdate)
+    log(f"Created {requested} leave requests.")
+
+    rebuild_current_passes(seeded_students(), now=now)
+    occupancy.reconcile()
+    return {"students": len(created), "logs": logged, "leaves": requested}
+
+
+def flush(batch_size=1000):
+    """Delete seeded students (their logs and leave requests cascade) in batches."""
+    deleted = 0
+    while True:
+        ids = list(seeded_students().order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            Student.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+    occupancy.reconcile()
+    return deleted
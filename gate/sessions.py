@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+REFRESHED_AT_KEY = "_gate_refreshed_at"
+
+
+def needs_refresh(session, now=None):
+    """
+    True once SESSION_REFRESH_FRACTION of SESSION_COOKIE_AGE has passed since
+    the session's expiry was last pushed forward.
+    """
+    now = now or time.time()
+    refreshed_at = session.get(REFRESHED_AT_KEY)
+    if refreshed_at is None:
+        return True
+    return now - refreshed_at >= settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION
+
+
+def refresh(session, now=None):
+    """Mark the session modified so SessionMiddleware saves it with a fresh expiry."""
+    session[REFRESHED_AT_KEY] = now or time.time()
+
+
+def purge_expired_sessions(batch_size=1000, max_batches=None, now=None):
+    """
+    Delete expired sessions batch_size rows at a time, so the cleanup never
+    holds a long lock on django_session. Returns the number deleted.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).order_by().values_list("pk", flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        deleted += Session.objects.filter(pk__in=keys, expire_date__lt=now).delete()[0]
+        batches += 1
+    return deleted
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import Group, User
+from django.db import models, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Student, LeaveRequest
+from . import fragments, lookup, metrics, occupancy, roles
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_caches(sender, instance, **kwargs):
+    lookup.invalidate([instance.enrollment_number])
+    fragments.bump_students([instance.pk])
+
+
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def invalidate_leave_caches(sender, instance, **kwargs):
+    fragments.bump(fragments.LEAVES)
+    fragments.bump_students([instance.student_id])
+    if LeaveRequest.student.field.is_cached(instance):
+        enrollment = instance.student.enrollment_number
+    else:
+        enrollment = Student.objects.filter(pk=instance.student_id).values_list("enrollment_number", flat=True).first()
+    if enrollment:
+        lookup.invalidate([enrollment])
+
+
+@receiver(post_save, sender=Student)
+def invalidate_student_roles(sender, instance, **kwargs):
+    # request.roles.is_student follows Student.user, which most saves leave alone.
+    # A user_id that was deferred and never set is unchanged.
+    previous = getattr(instance, "_loaded_user_id", None)
+    current = instance.__dict__.get("user_id", previous)
+    instance._loaded_user_id = current
+    if current != previous:
+        transaction.on_commit(roles.bump_version)
+
+
+@receiver(post_delete, sender=Student)
+def invalidate_deleted_student_roles(sender, instance, **kwargs):
+    if instance.__dict__.get("user_id", models.DEFERRED) is not None:
+        transaction.on_commit(roles.bump_version)
+
+
+@receiver(post_save, sender=Student)
+def invalidate_student_occupancy(sender, instance, created, update_fields=None, **kwargs):
+    # Scans shift the counters themselves (occupancy.record_move); this covers
+    # new students and saves that change hostel_name or is_inside
+    previous = getattr(instance, "_loaded_occupancy", None)
+    current = tuple(instance.__dict__.get(name, models.DEFERRED) for name in Student.OCCUPANCY_FIELDS)
+    if previous is None:
+        changed = True
+    else:
+        saved = update_fields or Student.OCCUPANCY_FIELDS
+        changed = any(
+            name in saved and new is not models.DEFERRED and new != old
+            for name, new, old in zip(Student.OCCUPANCY_FIELDS, current, previous)
+        )
+        current = tuple(old if new is models.DEFERRED else new for new, old in zip(current, previous))
+    instance._loaded_occupancy = current
+    if created or changed:
+        transaction.on_commit(occupancy.invalidate)
+
+
+@receiver(post_delete, sender=Student)
+def invalidate_deleted_student_occupancy(sender, instance, **kwargs):
+    transaction.on_commit(occupancy.invalidate)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles(sender, **kwargs):
+    if kwargs.get("action", "post_").startswith("post_"):
+        # After commit, or a request could re-cache the old roles under the new version
+        transaction.on_commit(roles.bump_version)
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    metrics.install_query_counter(connection)
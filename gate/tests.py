@@ -1,3 +1,1520 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from asyncio import iscoroutinefunction
+from datetime import datetime, timedelta
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from .budgets import budget_for
+from .importers import import_photos, import_students
+from .jobs import STALE_JOB_ERROR, claim_next_job, reclaim_stale_jobs, run_job
+from .models import Student, MovementLog, MovementLogArchive, DailyMovementRollup, HourlyTraffic, LeaveRequest, Job
+from .passes import expire_passes, rebuild_current_passes, refresh_current_pass
+from . import analytics, approvals, archiving, async_views, benchmark, fragments, lookup, metrics, occupancy, pagination, roles, scanning, seeding, sessions, thumbnails, views
+
+
+def zip_upload(*names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"not really an image")
+    return SimpleUploadedFile("photos.zip", buffer.getvalue(), content_type="application/zip")
+
+
+def approved_pass(student, starts, ends, request_type=LeaveRequest.OUTPASS):
+    return LeaveRequest.objects.create(
+        student=student, request_type=request_type, reason="Home", from_date=starts, to_date=ends,
+        status=LeaveRequest.STATUS_APPROVED,
+    )
+
+
+def csv_upload(*rows):
+    lines = ["enrollment_number,full_name,hostel_name", *(",".join(row) for row in rows)]
+    return SimpleUploadedFile("students.csv", "\n".join(lines).encode(), content_type="text/csv")
+
+
+def image_bytes(size=(300, 200), image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 40, 40)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class InlineExecutor:
+    """Stands in for ProcessPoolExecutor and runs the work in this process."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+class TemporaryMediaMixin:
+    """Save uploads to a temporary MEDIA_ROOT, removed after the class."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+
+class AsyncURLConf:
+    """config.urls as ASGI deployments route it: views with an async twin go to gate.async_views."""
+
+    urlpatterns = [
+        URLPattern(pattern.pattern, getattr(async_views, pattern.callback.__name__), pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern)
+        and pattern.callback.__module__ == "gate.views"
+        and iscoroutinefunction(getattr(async_views, pattern.callback.__name__, None))
+        else pattern
+        for pattern in get_resolver("config.urls").url_patterns
+    ]
+
+
+class QueryPlanTests(TestCase):
+    """
+    Request the hot gate views, EXPLAIN every SELECT they actually ran and
+    fail if the planner falls back to a sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.warden.user_permissions.add(*Permission.objects.filter(content_type__app_label="gate"))
+        cls.student_user = User.objects.create_user("student")
+        cls.student = Student.objects.create(
+            enrollment_number="E1001", full_name="Test Student", hostel_name="H1", user=cls.student_user
+        )
+        Student.objects.create(enrollment_number="E1002", full_name="Other Student", hostel_name="H1")
+        now = timezone.now()
+        approved_pass(cls.student, now - timedelta(hours=1), now + timedelta(hours=1))
+        refresh_current_pass(cls.student)
+        LeaveRequest.objects.create(
+            student=cls.student, request_type=LeaveRequest.OUTPASS, reason="Home",
+            from_date=now + timedelta(days=1), to_date=now + timedelta(days=2),
+        )
+        MovementLog.objects.create(student=cls.student, direction=MovementLog.OUT, timestamp=now - timedelta(days=90))
+        archiving.archive_logs(now - timedelta(days=60))
+        for direction in (MovementLog.OUT, MovementLog.IN):
+            MovementLog.objects.create(student=cls.student, direction=direction, recorded_by=cls.guard)
+
+    def hot_requests(self):
+        """(user, method, url name, data, tables the view reads in full by design)."""
+        updated_at = Student.objects.values_list("updated_at", flat=True).get(pk=self.student.pk)
+        delta_cursor = f"{views._to_version(updated_at)}.{self.student.pk}"
+        log_cursor = pagination.encode_cursor([timezone.now(), 0])
+        return [
+            (self.guard, "get", "check", {"enr": "e1001"}, ()),
+            (self.guard, "post", "gate_scan", {"enrollment_number": "e1001", "expected": "in"}, ()),
+            (self.guard, "post", "gate_toggle", {"enrollment_number": "E1001"}, ()),
+            (None, "post", "api_check", {"enrollment_number": "E1001"}, ()),
+            (self.guard, "json", "api_check_v2", ["E1001", "E1002", "MISSING"], ()),
+            # A snapshot is every student, so it reads the whole table
+            (self.guard, "get", "kiosk_snapshot", {}, ("gate_student",)),
+            (self.guard, "get", "kiosk_delta", {"since": "0"}, ()),
+            (self.guard, "get", "kiosk_delta", {"since": "0", "after": delta_cursor}, ()),
+            (self.warden, "get", "home", {}, ()),
+            (self.warden, "get", "logs", {}, ()),
+            (self.warden, "get", "logs", {"cursor": log_cursor, "size": 1}, ()),
+            (self.warden, "get", "logs", {"direction": MovementLog.OUT, "hostel": "H1", "student": "E1001"}, ()),
+            (self.warden, "get", "logs", {"guard": "guard", "date_from": timezone.localdate().isoformat()}, ()),
+            (self.guard, "get", "inside", {}, ()),
+            (self.guard, "get", "outside", {"cursor": pagination.encode_cursor(["E1000"])}, ()),
+            (self.warden, "get", "approval_dashboard", {}, ()),
+            (self.student_user, "get", "student_dashboard", {}, ()),
+        ]
+
+    def captured_selects(self, user, method, name, data):
+        self.client.logout()
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            if method == "json":
+                response = self.client.post(reverse(name), json.dumps(data), content_type="application/json")
+            else:
+                response = getattr(self.client, method)(reverse(name), data)
+        self.assertLess(response.status_code, 400)
+        return [query["sql"] for query in queries.captured_queries if query["sql"].lstrip().upper().startswith("SELECT")]
+
+    def explain(self, sql):
+        if connection.vendor == "postgresql":
+            # Tiny test tables always favour a seq scan; make the planner
+            # show whether an index is usable at all.
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}")
+                return "\n".join(row[0] for row in cursor.fetchall())
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(row[-1] for row in cursor.fetchall())
+
+    def sequential_scans(self, plan):
+        if connection.vendor == "postgresql":
+            return set(re.findall(r"Seq Scan on (\w+)", plan))
+        # SQLite reports "SCAN <table>" without "USING ... INDEX" for a full table scan
+        return {match.group(1) for line in plan.splitlines() if (match := re.search(r"\bSCAN (\w+)$", line.strip()))}
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.skipTest("query plans are only checked on SQLite and PostgreSQL")
+
+        for user, method, name, data, full_tables in self.hot_requests():
+            with self.subTest(view=name, data=data):
+                selects = self.captured_selects(user, method, name, data)
+                self.assertTrue(any("gate_" in sql for sql in selects), f"{name} ran no gate queries")
+                for sql in selects:
+                    plan = self.explain(sql)
+                    self.assertFalse(self.sequential_scans(plan) - set(full_tables), f"{sql}\n{plan}")
+
+
+# Budgets are declared for a deployment with a shared cache (REDIS_URL); the
+# test process has a single LocMem cache, which behaves the same
+@override_settings(ROLE_CACHE_SECONDS=300, SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+class QueryBudgetTests(TemporaryMediaMixin, TestCase):
+    """
+    Request every gate view against a small data set and fail if it runs
+    more queries than its @query_budget. Every table holds several rows, so
+    an N+1 shows up as extra queries rather than hiding behind a single row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        perms = Permission.objects.filter(content_type__app_label="gate")
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.groups.add(Group.objects.create(name="Guard"))
+        cls.guard.user_permissions.add(*perms.filter(codename="can_toggle_status"))
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.warden.user_permissions.add(*perms)
+        cls.student_user = User.objects.create_user("student")
+
+        cls.students = [
+            Student.objects.create(
+                enrollment_number=f"E{index:04d}",
+                full_name=f"Student {index}",
+                hostel_name=f"H{index % 2}",
+                is_inside=index % 3 != 0,
+                user=cls.student_user if index == 0 else None,
+            )
+            for index in range(6)
+        ]
+        for student in cls.students:
+            for status in (LeaveRequest.STATUS_PENDING, LeaveRequest.STATUS_APPROVED, LeaveRequest.STATUS_REJECTED):
+                LeaveRequest.objects.create(
+                    student=student,
+                    request_type=LeaveRequest.OUTPASS,
+                    reason="Market",
+                    from_date=now - timedelta(hours=1),
+                    to_date=now + timedelta(hours=3),
+                    status=status,
+                )
+            for direction in (MovementLog.OUT, MovementLog.IN, MovementLog.OUT):
+                MovementLog.objects.create(student=student, direction=direction, recorded_by=cls.guard)
+        cls.job = Job.objects.create(kind=Job.IMPORT_STUDENTS, created_by=cls.warden)
+
+    def requests(self):
+        """(user, method, path, data) for each request; method "json" posts data as a JSON body."""
+        enrollments = [student.enrollment_number for student in self.students]
+        pending = list(
+            LeaveRequest.objects.filter(status=LeaveRequest.STATUS_PENDING).order_by("pk").values_list("pk", flat=True)
+        )
+        now = timezone.now()
+        scans = [
+            {"enrollment_number": enrollments[5], "direction": MovementLog.OUT, "timestamp": now.isoformat()},
+            {"enrollment_number": enrollments[4], "direction": MovementLog.IN, "timestamp": now.isoformat()},
+            {"enrollment_number": "MISSING", "direction": MovementLog.IN, "timestamp": now.isoformat()},
+        ]
+        leave = {
+            "reason": "Home",
+            "destination": "City",
+            "from_date": (now + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M"),
+            "to_date": (now + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M"),
+        }
+        return [
+            (self.warden, "get", reverse("home"), {}),
+            (self.warden, "get", reverse("post_login_redirect"), {}),
+            (self.student_user, "get", reverse("student_profile"), {}),
+            (self.student_user, "post", reverse("student_profile"), {"hostel_name": "H1", "room_number": "12", "phone": "555"}),
+            (self.student_user, "get", reverse("student_dashboard"), {}),
+            (self.student_user, "post", reverse("student_dashboard"), leave),
+            (self.student_user, "post", reverse("apply_outpass"), {}),
+            (self.guard, "get", reverse("check"), {"enr": enrollments[1]}),
+            (self.guard, "get", reverse("check"), {"enr": "Student"}),
+            (self.guard, "post", reverse("gate_toggle"), {"enrollment_number": enrollments[0]}),
+            (self.guard, "post", reverse("gate_scan"), {"enrollment_number": enrollments[3]}),
+            (self.warden, "get", reverse("logs"), {}),
+            (self.warden, "get", reverse("export_logs"), {}),
+            (self.warden, "get", reverse("warden_dashboard"), {}),
+            (self.warden, "get", reverse("live_feed"), {}),
+            (self.warden, "get", reverse("live_poll"), {"after": "0"}),
+            (self.warden, "get", reverse("approval_dashboard"), {}),
+            (self.warden, "post", reverse("approve_leave", args=[pending[0]]), {}),
+            (self.warden, "post", reverse("reject_leave", args=[pending[1]]), {}),
+            (self.warden, "post", reverse("bulk_leave_action"), {"action": "approve", "ids": pending[2:]}),
+            (self.warden, "get", reverse("add_student"), {}),
+            (self.warden, "post", reverse("add_student"), {"enrollment_number": "E9000", "full_name": "New Student", "year": 1}),
+            (self.warden, "get", reverse("import_students_csv"), {}),
+            (self.warden, "post", reverse("import_students_csv"), {"file": csv_upload(("E9001", "Imported", "H1"))}),
+            (self.warden, "post", reverse("import_photos_zip"), {}),
+            (self.warden, "post", reverse("import_photos_zip"), {"file": zip_upload(f"{enrollments[1]}.jpg")}),
+            (self.warden, "get", reverse("job_status", args=[self.job.pk]), {}),
+            (self.guard, "get", reverse("photo_thumbnail", args=["missing.webp"]), {}),
+            (self.guard, "get", reverse("inside"), {}),
+            (self.guard, "get", reverse("outside"), {}),
+            (None, "post", reverse("api_check"), {"enrollment_number": enrollments[2]}),
+            (self.guard, "json", reverse("api_check_v2"), enrollments),
+            (self.guard, "get", reverse("kiosk_snapshot"), {}),
+            (self.guard, "get", reverse("kiosk_delta"), {"since": "0"}),
+            (self.guard, "json", reverse("kiosk_upload_scans"), {"scans": scans}),
+            (None, "get", reverse("metrics"), {}),
+        ]
+
+    def send(self, method, path, data):
+        if method == "json":
+            response = self.client.post(path, json.dumps(data), content_type="application/json")
+        else:
+            response = getattr(self.client, method)(path, data)
+        if response.streaming and response.get("Content-Type") != "text/event-stream":
+            b"".join(response.streaming_content)
+        response.close()
+        return response
+
+    def test_every_gate_view_has_a_budget_and_a_request(self):
+        requested = {resolve(path).url_name for _, _, path, _ in self.requests()}
+        for pattern in get_resolver().url_patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.callback.__module__.startswith("gate."):
+                continue
+            with self.subTest(view=pattern.name):
+                self.assertIsNotNone(budget_for(pattern.callback), "missing @query_budget")
+                self.assertIn(pattern.name, requested)
+
+    def test_views_stay_within_budget(self):
+        self.assertWithinBudget(self.requests())
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    def test_async_views_stay_within_budget(self):
+        requests = [request for request in self.requests() if iscoroutinefunction(resolve(request[2]).func)]
+        self.assertEqual(
+            {resolve(path).url_name for _, _, path, _ in requests},
+            {"check", "gate_toggle", "gate_scan", "live_feed", "api_check"},
+        )
+        self.assertWithinBudget(requests)
+
+    def assertWithinBudget(self, requests):
+        for user, method, path, data in requests:
+            with self.subTest(method=method, path=path):
+                self.client.logout()
+                if user is not None:
+                    self.client.force_login(user)
+                    # Warm the cached roles, as any earlier page view would
+                    self.client.get(reverse("check"))
+                budget = budget_for(resolve(path).func)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.send(method, path, data)
+                self.assertLess(response.status_code, 500)
+                sql = "\n".join(query["sql"] for query in queries.captured_queries)
+                self.assertLessEqual(len(queries), budget, f"{path} ran {len(queries)} queries:\n{sql}")
+
+
+class ScanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+        cls.student = Student.objects.create(enrollment_number="G1", full_name="Gate Student")
+        approved_pass(cls.student, now - timedelta(hours=1), now + timedelta(hours=2))
+        refresh_current_pass(cls.student)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.guard)
+
+    def scan(self, key="", **data):
+        return self.client.post(reverse("gate_scan"), {"enrollment_number": "g1", **data}, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_scan_looks_up_and_toggles_in_one_request(self):
+        response = self.scan()
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual((payload["ok"], payload["direction"], payload["is_inside"]), (True, MovementLog.OUT, False))
+        self.assertEqual(payload["pass"]["type"], LeaveRequest.OUTPASS)
+        self.assertFalse(Student.objects.get(pk=self.student.pk).is_inside)
+
+    def test_unknown_student_is_not_found(self):
+        response = self.client.post(reverse("gate_scan"), {"enrollment_number": "NOPE"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"], "not_found")
+
+    def test_no_active_pass_is_refused(self):
+        LeaveRequest.objects.update(status=LeaveRequest.STATUS_REJECTED)
+        rebuild_current_passes()
+        response = self.scan()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "no_active_pass")
+        self.assertFalse(MovementLog.objects.exists())
+
+    def test_duplicate_idempotency_key_replays_the_first_result(self):
+        first = self.scan(key="scan-1").json()
+        second = self.scan(key="scan-1").json()
+        self.assertEqual(second, {**first, "duplicate": True})
+        self.assertEqual(MovementLog.objects.count(), 1)
+
+        # The key belongs to one scan; a new key toggles again
+        self.assertEqual(self.scan(key="scan-2").json()["direction"], MovementLog.IN)
+
+    def test_duplicate_toggle_form_post_is_ignored(self):
+        data = {"enrollment_number": "G1", "idempotency_key": "form-1"}
+        self.client.post(reverse("gate_toggle"), data)
+        self.client.post(reverse("gate_toggle"), data)
+        self.assertEqual(MovementLog.objects.count(), 1)
+
+    def test_stale_scan_reports_the_current_state(self):
+        response = self.scan(key="scan-1", expected="out")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "stale")
+        self.assertTrue(response.json()["is_inside"])
+        self.assertFalse(MovementLog.objects.exists())
+
+        # A refused scan frees its key for the retry
+        self.assertTrue(self.scan(key="scan-1", expected="in").json()["ok"])
+
+    def test_stale_toggle_form_post_frees_its_key(self):
+        for urlconf in (settings.ROOT_URLCONF, AsyncURLConf):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf), transaction.atomic():
+                data = {"enrollment_number": "G1", "idempotency_key": "form-1"}
+                self.client.post(reverse("gate_toggle"), {**data, "expected": "out"})
+                self.assertFalse(MovementLog.objects.exists())
+
+                self.client.post(reverse("gate_toggle"), {**data, "expected": "in"})
+                self.assertEqual(MovementLog.objects.get().direction, MovementLog.OUT)
+                transaction.set_rollback(True)
+            cache.clear()
+
+    def test_racing_toggle_raises_stale_scan(self):
+        student = Student.objects.get(pk=self.student.pk)
+        # Another guard moves the student OUT after this one loaded the row
+        Student.objects.filter(pk=student.pk).update(is_inside=False)
+        with self.assertRaises(scanning.StaleScan):
+            scanning.toggle_student(student, user=self.guard)
+        self.assertFalse(MovementLog.objects.exists())
+
+
+class AsyncParityTests(TestCase):
+    """The async twins answer every gate request exactly as the sync views do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+        cls.student = Student.objects.create(enrollment_number="A1", full_name="Async Student")
+        approved_pass(cls.student, now - timedelta(hours=1), now + timedelta(hours=2))
+        refresh_current_pass(cls.student)
+        Student.objects.create(enrollment_number="A2", full_name="Passless Student")
+        cls.leaver = Student.objects.create(enrollment_number="A3", full_name="Leaving Student")
+        approved_pass(cls.leaver, now - timedelta(hours=1), now + timedelta(hours=2))
+        refresh_current_pass(cls.leaver)
+
+    def scan(self, key, **data):
+        response = self.client.post(reverse("gate_scan"), data, HTTP_IDEMPOTENCY_KEY=key)
+        payload = response.json()
+        payload.pop("timestamp", None)
+        return response.status_code, payload
+
+    def toggle(self, key, **data):
+        response = self.client.post(reverse("gate_toggle"), {"idempotency_key": key, **data}, follow=True)
+        return response.redirect_chain, [str(message) for message in response.context["messages"]]
+
+    def run_gate(self):
+        """Replay one shift's requests and return every response and the rows they left behind."""
+        cache.clear()
+        self.client.force_login(self.guard)
+        outcomes = [
+            self.scan("k1", enrollment_number="a1"),
+            self.scan("k1", enrollment_number="a1"),
+            self.scan("k2", enrollment_number="A1", expected="in"),
+            self.scan("k2", enrollment_number="A1", expected="out"),
+            self.scan("k3", enrollment_number="A2"),
+            self.scan("k4", enrollment_number="NOPE"),
+            self.scan("k5"),
+            self.toggle("t1", enrollment_number="A3", expected="in"),
+            self.toggle("t1", enrollment_number="A3", expected="in"),
+            self.toggle("t2", enrollment_number="A3", expected="in"),
+            self.toggle("t3", enrollment_number="A2"),
+        ]
+        check = self.client.get(reverse("check"), {"enr": "a1"})
+        outcomes.append((check.status_code, check.context["student"].enrollment_number))
+        for enrollment in ("A1", "nope"):
+            response = self.client.post(reverse("api_check"), {"enrollment_number": enrollment})
+            outcomes.append((response.status_code, response.json()))
+        outcomes.append(list(MovementLog.objects.order_by("pk").values_list("student__enrollment_number", "direction")))
+        outcomes.append(list(Student.objects.order_by("pk").values_list("is_inside", flat=True)))
+        return outcomes
+
+    def test_async_views_match_the_sync_views(self):
+        runs = []
+        for urlconf in (settings.ROOT_URLCONF, AsyncURLConf):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf), transaction.atomic():
+                self.assertEqual(iscoroutinefunction(resolve(reverse("gate_scan")).func), urlconf is AsyncURLConf)
+                runs.append(self.run_gate())
+                transaction.set_rollback(True)
+        sync_run, async_run = runs
+        for step, (expected, actual) in enumerate(zip(sync_run, async_run)):
+            with self.subTest(step=step):
+                self.assertEqual(actual, expected)
+
+        # The replayed shift exercises the duplicate, stale and refused paths
+        self.assertEqual(sync_run[1][1]["duplicate"], True)
+        self.assertEqual((sync_run[2][0], sync_run[2][1]["error"]), (409, "stale"))
+        self.assertEqual(sync_run[3][1]["direction"], MovementLog.IN)
+        self.assertEqual(sync_run[4][1]["error"], "no_active_pass")
+        self.assertEqual(sync_run[7][1], ["Leaving Student marked OUT."])
+        self.assertEqual(sync_run[8][1], ["This scan was already submitted."])
+        self.assertEqual(sync_run[9][1], ["Leaving Student is already marked OUT."])
+        self.assertEqual(sync_run[10][1], ["No active approved leave or outpass."])
+        self.assertEqual(sync_run[-2], [("A1", MovementLog.OUT), ("A1", MovementLog.IN), ("A3", MovementLog.OUT)])
+
+
+class CurrentPassTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(enrollment_number="P1", full_name="Pass Student")
+
+    def test_refresh_points_at_the_first_pass_still_running(self):
+        now = timezone.now()
+        approved_pass(self.student, now - timedelta(days=3), now - timedelta(days=2))
+        later = approved_pass(self.student, now + timedelta(days=1), now + timedelta(days=2))
+        current = approved_pass(self.student, now - timedelta(hours=1), now + timedelta(hours=1))
+
+        self.assertTrue(refresh_current_pass(self.student, now))
+        self.assertEqual(self.student.current_pass_id, current.pk)
+        self.assertEqual(scanning.get_active_pass(self.student, now), current)
+        self.assertFalse(refresh_current_pass(self.student, now))
+
+        # Once it has ended the gate moves on to the queued pass, which is not active yet
+        after = now + timedelta(hours=2)
+        self.assertIsNone(scanning.get_active_pass(self.student, after))
+        self.assertEqual(Student.objects.get(pk=self.student.pk).current_pass_id, later.pk)
+
+    def test_rebuild_reports_and_repairs_drift(self):
+        now = timezone.now()
+        leave = approved_pass(self.student, now - timedelta(hours=1), now + timedelta(hours=1))
+        expected = (leave.pk, leave.from_date, leave.to_date)
+
+        mismatches = rebuild_current_passes(dry_run=True, now=now)
+        self.assertEqual(mismatches, [(self.student.pk, (None, None, None), expected)])
+        self.assertIsNone(Student.objects.get(pk=self.student.pk).current_pass_id)
+
+        rebuild_current_passes(now=now)
+        self.assertEqual(Student.objects.get(pk=self.student.pk).current_pass_id, leave.pk)
+        self.assertEqual(rebuild_current_passes(now=now), [])
+
+    def test_expire_passes_marks_ended_passes_and_repoints_students(self):
+        now = timezone.now()
+        ended = approved_pass(self.student, now - timedelta(days=2), now - timedelta(days=1))
+        refresh_current_pass(self.student, now - timedelta(days=1, hours=12))
+        upcoming = approved_pass(self.student, now + timedelta(days=1), now + timedelta(days=2))
+
+        self.assertEqual(expire_passes(now=now, batch_size=1), (1, 1))
+        ended.refresh_from_db()
+        self.assertEqual(ended.status, LeaveRequest.STATUS_EXPIRED)
+        self.assertEqual(Student.objects.get(pk=self.student.pk).current_pass_id, upcoming.pk)
+        self.assertEqual(expire_passes(now=now), (0, 0))
+
+
+class JobQueueTests(TestCase):
+    def test_claim_takes_the_oldest_queued_job(self):
+        first = Job.objects.create(kind=Job.IMPORT_STUDENTS)
+        Job.objects.create(kind=Job.IMPORT_STUDENTS)
+        job = claim_next_job()
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+        self.assertIsNotNone(job.started_at)
+
+    def test_failing_handler_marks_the_job_failed(self):
+        job = Job.objects.create(kind="unknown")
+        with self.assertLogs("gate.jobs", "ERROR"):
+            run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertIn("No handler registered", job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_reclaim_fails_jobs_left_running(self):
+        now = timezone.now()
+        stale = Job.objects.create(kind=Job.IMPORT_STUDENTS, status=Job.STATUS_RUNNING, started_at=now - timedelta(hours=2))
+        fresh = Job.objects.create(kind=Job.IMPORT_STUDENTS, status=Job.STATUS_RUNNING, started_at=now)
+
+        self.assertEqual(reclaim_stale_jobs(timeout=3600, now=now), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, Job.STATUS_FAILED)
+        self.assertEqual(stale.error, STALE_JOB_ERROR)
+        self.assertEqual(fresh.status, Job.STATUS_RUNNING)
+
+
+class KioskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+
+    def setUp(self):
+        self.client.force_login(self.guard)
+
+    def upload(self, *scans):
+        response = self.client.post(reverse("kiosk_upload_scans"), json.dumps({"scans": list(scans)}), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return [result["status"] for result in response.json()["results"]]
+
+    def test_lost_race_reloads_the_student_for_later_scans(self):
+        student = Student.objects.create(enrollment_number="K1", full_name="Kiosk Student")
+        now = timezone.now()
+        real_replay = scanning.replay_scan
+
+        def another_guard_first(student, *args, **kwargs):
+            if not MovementLog.objects.exists():
+                # A guard moves the student OUT between the batch load and the replay
+                Student.objects.filter(pk=student.pk).update(is_inside=False)
+                MovementLog.objects.create(student=student, direction=MovementLog.OUT, timestamp=now - timedelta(minutes=1))
+            return real_replay(student, *args, **kwargs)
+
+        with mock.patch("gate.views.replay_scan", side_effect=another_guard_first):
+            statuses = self.upload(
+                {"enrollment_number": "K1", "direction": "OUT", "timestamp": (now - timedelta(minutes=10)).isoformat()},
+                {"enrollment_number": "K1", "direction": "IN", "timestamp": (now - timedelta(seconds=30)).isoformat()},
+            )
+
+        self.assertEqual(statuses, ["duplicate", "applied"])
+        student.refresh_from_db()
+        self.assertTrue(student.is_inside)
+
+    def test_snapshot_is_not_resent_while_nothing_changed(self):
+        student = Student.objects.create(enrollment_number="K1", full_name="Kiosk Student")
+        first = self.client.get(reverse("kiosk_snapshot"))
+        self.assertEqual(first.json()["students"], [["K1", "Kiosk Student", True, None, None]])
+
+        again = self.client.get(reverse("kiosk_snapshot"), HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        student.full_name = "Renamed Student"
+        student.save()
+        changed = self.client.get(reverse("kiosk_snapshot"), HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_delta_returns_rows_changed_since_the_version(self):
+        Student.objects.create(enrollment_number="K1", full_name="Kiosk Student")
+        Student.objects.create(enrollment_number="K2", full_name="Other Student")
+        version = self.client.get(reverse("kiosk_snapshot")).json()["version"]
+        Student.objects.filter(enrollment_number="K2").update(
+            is_inside=False, updated_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        delta = self.client.get(reverse("kiosk_delta"), {"since": version}).json()
+        # The overlap window resends recent rows; K2 comes last with its new state
+        self.assertEqual(delta["students"][-1][:3], ["K2", "Other Student", False])
+        self.assertGreater(delta["version"], version)
+        self.assertFalse(delta["truncated"])
+
+        with mock.patch("gate.views.KIOSK_DELTA_LIMIT", 1):
+            self.assertTrue(self.client.get(reverse("kiosk_delta"), {"since": 0}).json()["truncated"])
+
+        self.assertEqual(self.client.get(reverse("kiosk_delta"), {"since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("kiosk_delta"), {"since": 0, "after": "x"}).status_code, 400)
+
+    def test_truncated_delta_pages_through_rows_with_one_timestamp(self):
+        Student.objects.bulk_create(Student(enrollment_number=f"K{i:02d}", full_name="Kiosk Student") for i in range(25))
+        version = self.client.get(reverse("kiosk_snapshot")).json()["version"]
+        # One bulk UPDATE gives every row the same updated_at
+        Student.objects.update(is_inside=False, updated_at=timezone.now() + timedelta(minutes=1))
+
+        received = []
+        params = {"since": version}
+        with mock.patch("gate.views.KIOSK_DELTA_LIMIT", 10):
+            for _ in range(5):
+                delta = self.client.get(reverse("kiosk_delta"), params).json()
+                received += [row[0] for row in delta["students"]]
+                if not delta["truncated"]:
+                    break
+                params["after"] = delta["next"]
+
+        self.assertFalse(delta["truncated"])
+        self.assertIsNone(delta["next"])
+        self.assertEqual(sorted(received), [f"K{i:02d}" for i in range(25)])
+        self.assertGreater(delta["version"], version)
+
+    def test_upload_reports_each_scan(self):
+        now = timezone.now()
+        Student.objects.create(enrollment_number="K1", full_name="No Pass")
+        already_in = Student.objects.create(enrollment_number="K2", full_name="Already In")
+        MovementLog.objects.create(student=already_in, direction=MovementLog.IN, timestamp=now - timedelta(minutes=5))
+        Student.objects.create(enrollment_number="K3", full_name="Already Out", is_inside=False)
+        Student.objects.create(enrollment_number="K4", full_name="Coming Back", is_inside=False)
+
+        def scan(enrollment, direction, minutes_ago):
+            timestamp = now - timedelta(minutes=minutes_ago)
+            return {"enrollment_number": enrollment, "direction": direction, "timestamp": timestamp.isoformat()}
+
+        statuses = self.upload(
+            scan("K1", MovementLog.OUT, 10),
+            scan("K2", MovementLog.OUT, 30),
+            scan("K3", MovementLog.OUT, 1),
+            scan("K4", MovementLog.IN, 2),
+            scan("NOPE", MovementLog.IN, 2),
+            scan("K4", "SIDEWAYS", 2),
+        )
+
+        self.assertEqual(statuses, ["flagged", "stale", "duplicate", "applied", "not_found", "invalid"])
+        flagged = MovementLog.objects.get(student__enrollment_number="K1")
+        self.assertTrue(flagged.note.startswith("[offline: no active pass]"))
+        self.assertEqual(flagged.timestamp, now - timedelta(minutes=10))
+        self.assertEqual(MovementLog.objects.count(), 3)
+
+
+class OccupancyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(enrollment_number="O1", full_name="Occupant", hostel_name="H1")
+        Student.objects.create(enrollment_number="O2", full_name="Neighbour", hostel_name="H1", is_inside=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return {hostel["name"]: (hostel["inside"], hostel["outside"]) for hostel in occupancy.get_occupancy()["hostels"]}
+
+    def test_scans_shift_the_cached_counters(self):
+        self.assertEqual(self.counts(), {"H1": (1, 1)})
+        with self.captureOnCommitCallbacks(execute=True):
+            scanning.replay_scan(self.student, MovementLog.OUT, timezone.now())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), {"H1": (0, 2)})
+
+    def test_new_moved_and_deleted_students_are_recounted(self):
+        self.assertEqual(self.counts(), {"H1": (1, 1)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(enrollment_number="O3", full_name="Newcomer", hostel_name="H2")
+        self.assertEqual(self.counts(), {"H1": (1, 1), "H2": (1, 0)})
+
+        student = Student.objects.get(pk=self.student.pk)
+        student.hostel_name = "H2"
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+        self.assertEqual(self.counts(), {"H1": (0, 1), "H2": (2, 0)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.get(enrollment_number="O2").delete()
+        self.assertEqual(self.counts(), {"H2": (2, 0)})
+
+    def test_saves_that_leave_the_counters_alone_keep_them(self):
+        self.counts()
+        student = Student.objects.get(pk=self.student.pk)
+        student.room_number = "12"
+        now = timezone.now()
+        approved_pass(student, now, now + timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            student.save()
+            self.assertTrue(refresh_current_pass(student))
+        self.assertNotIn(occupancy.invalidate, callbacks)
+        with self.assertNumQueries(0):
+            self.counts()
+
+
+class MovementLogFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.student = Student.objects.create(enrollment_number="L1", full_name="Log Student", hostel_name="H1")
+        MovementLog.objects.create(student=cls.student, direction=MovementLog.OUT)
+        MovementLog.objects.create(student=cls.student, direction=MovementLog.IN)
+
+    def setUp(self):
+        self.client.force_login(self.warden)
+
+    def test_filters_narrow_the_logs(self):
+        response = self.client.get(reverse("logs"), {"direction": MovementLog.OUT})
+        self.assertEqual([log.direction for log in response.context["logs"]], [MovementLog.OUT])
+
+    def test_invalid_filter_lists_nothing(self):
+        response = self.client.get(reverse("logs"), {"date_from": "2024-13-45", "hostel": "Nowhere"})
+        self.assertEqual(list(response.context["logs"]), [])
+        self.assertEqual(set(response.context["form"].errors), {"date_from", "hostel"})
+        self.assertContains(response, "filter-errors")
+
+    def test_invalid_filter_export_is_refused(self):
+        response = self.client.get(reverse("export_logs"), {"date_from": "not-a-date"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_the_filtered_rows(self):
+        response = self.client.get(reverse("export_logs"), {"direction": MovementLog.IN})
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertIn(",IN,", rows[1])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        student = Student.objects.create(enrollment_number="K1", full_name="Paged Student")
+        MovementLog.objects.bulk_create(MovementLog(student=student, direction=MovementLog.OUT) for _ in range(5))
+        cls.moment = timezone.now().replace(microsecond=123456)
+        MovementLog.objects.update(timestamp=cls.moment)
+
+    def test_cursor_round_trips_field_values(self):
+        cursor = pagination.encode_cursor([self.moment, 42])
+        self.assertNotIn("=", cursor)
+        self.assertEqual(pagination.decode_cursor(cursor, MovementLog, ["timestamp", "id"]), [self.moment, 42])
+
+    def test_invalid_cursors_decode_to_none(self):
+        valid = pagination.encode_cursor([self.moment, 42])
+        for cursor in (
+            "!!!",
+            valid[:-3],
+            pagination.encode_cursor({"timestamp": self.moment.isoformat()}),
+            pagination.encode_cursor([self.moment]),
+            pagination.encode_cursor([self.moment, 42, 43]),
+            pagination.encode_cursor(["yesterday", 42]),
+            pagination.encode_cursor([1700000000, 42]),
+        ):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(pagination.decode_cursor(cursor, MovementLog, ["timestamp", "id"]))
+
+    def test_pages_split_rows_with_one_timestamp(self):
+        self.client.force_login(self.warden)
+        expected = list(MovementLog.objects.order_by("-id").values_list("pk", flat=True))
+
+        seen = []
+        params = {"size": 2}
+        while True:
+            page = self.client.get(reverse("logs"), params).context["page"]
+            self.assertLessEqual(len(page), 2)
+            seen += [log.pk for log in page]
+            if not page.has_next:
+                break
+            params["cursor"] = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_falls_back_to_the_first_page(self):
+        self.client.force_login(self.warden)
+        first = self.client.get(reverse("logs"), {"size": 2}).context["page"]
+        tampered = self.client.get(reverse("logs"), {"size": 2, "cursor": "x" + first.next_cursor}).context["page"]
+        self.assertEqual([log.pk for log in tampered], [log.pk for log in first])
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.student = Student.objects.create(enrollment_number="R1", full_name="Archive Student", hostel_name="H1")
+        now = timezone.now()
+        noon = datetime.combine(timezone.localdate(now) - timedelta(days=90), datetime.min.time()) + timedelta(hours=12)
+        old = timezone.make_aware(noon)
+        recent = now - timedelta(hours=1)
+        # Pairs of equal timestamps on both sides of the archive boundary
+        for timestamp in (old, old, old + timedelta(hours=1), old + timedelta(days=1), recent, recent, now):
+            MovementLog.objects.create(student=cls.student, direction=MovementLog.OUT, timestamp=timestamp)
+        cls.old_ids = list(MovementLog.objects.filter(timestamp__lt=now - timedelta(days=30)).values_list("pk", flat=True))
+        cls.all_ids = list(MovementLog.objects.order_by("-timestamp", "-id").values_list("pk", flat=True))
+        cls.before = now - timedelta(days=30)
+
+    def test_archive_cutoff_is_the_start_of_the_oldest_kept_month(self):
+        now = timezone.make_aware(datetime(2026, 3, 15, 12))
+        self.assertEqual(archiving.archive_cutoff(2, now), timezone.make_aware(datetime(2026, 1, 1)))
+        self.assertEqual(archiving.archive_cutoff(3, now), timezone.make_aware(datetime(2025, 12, 1)))
+
+    def test_archive_moves_rows_in_batches_and_rolls_them_up(self):
+        self.assertEqual(archiving.archive_logs(self.before, dry_run=True), 4)
+        self.assertEqual(MovementLogArchive.objects.count(), 0)
+
+        self.assertEqual(archiving.archive_logs(self.before, batch_size=2, max_batches=1), 2)
+        self.assertEqual(archiving.archive_logs(self.before, batch_size=2), 2)
+
+        self.assertCountEqual(MovementLogArchive.objects.values_list("pk", flat=True), self.old_ids)
+        self.assertFalse(MovementLog.objects.filter(pk__in=self.old_ids).exists())
+        # The first day's three movements, split over two batches, fold into one row
+        rollups = DailyMovementRollup.objects.order_by("day").values_list("out_count", "in_count")
+        self.assertEqual(list(rollups), [(3, 0), (1, 0)])
+        self.assertEqual(archiving.archive_logs(self.before), 0)
+
+    def test_logs_page_through_live_and_archived_rows(self):
+        archiving.archive_logs(self.before, batch_size=3)
+        self.client.force_login(self.warden)
+
+        seen = []
+        params = {"size": 2}
+        for _ in range(len(self.all_ids)):
+            page = self.client.get(reverse("logs"), params).context["page"]
+            seen += [log.pk for log in page]
+            if not page.has_next:
+                break
+            params["cursor"] = page.next_cursor
+        self.assertEqual(seen, self.all_ids)
+
+    def test_export_streams_live_then_archived_rows(self):
+        archiving.archive_logs(self.before)
+        self.client.force_login(self.warden)
+        response = self.client.get(reverse("export_logs"))
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))[1:]
+        timestamps = [row[0] for row in rows]
+        self.assertEqual(len(rows), len(self.all_ids))
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+    def test_admin_falls_back_to_the_archive(self):
+        archiving.archive_logs(self.before)
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+        archived_id = self.old_ids[0]
+        response = self.client.get(reverse("admin:gate_movementlog_change", args=[archived_id]))
+        self.assertRedirects(response, reverse("admin:gate_movementlogarchive_change", args=[archived_id]))
+
+        old_range = {"timestamp__lt": self.before.date().isoformat(), "direction__exact": MovementLog.OUT}
+        response = self.client.get(reverse("admin:gate_movementlog_changelist"), old_range)
+        self.assertRedirects(
+            response, f"{reverse('admin:gate_movementlogarchive_changelist')}?{urlencode(old_range)}"
+        )
+        self.assertEqual(len(self.client.get(response.url).context["cl"].result_list), 4)
+
+        # Ranges that reach the live table stay there
+        response = self.client.get(reverse("admin:gate_movementlog_changelist"), {"timestamp__lt": "2999-01-01"})
+        self.assertEqual(response.status_code, 200)
+
+
+class StudentImportTests(TemporaryMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.warden.user_permissions.add(Permission.objects.get(codename="add_student"))
+        cls.student_user = User.objects.create_user("student")
+        Student.objects.create(enrollment_number="S1", full_name="Some Student", user=cls.student_user)
+
+    def test_imports_need_the_add_student_permission(self):
+        self.client.force_login(self.student_user)
+        self.assertEqual(self.client.post(reverse("import_photos_zip"), {"file": zip_upload("S1.jpg")}).status_code, 403)
+        self.assertEqual(self.client.get(reverse("import_students_csv")).status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def test_photo_zip_upload_queues_a_job(self):
+        self.client.force_login(self.warden)
+        response = self.client.post(reverse("import_photos_zip"), {"file": zip_upload("S1.jpg")})
+        job = Job.objects.get()
+        self.assertEqual(job.kind, Job.IMPORT_PHOTOS)
+        self.assertRedirects(response, f"{reverse('import_students_csv')}?job={job.pk}")
+
+    def test_import_upserts_in_chunks(self):
+        progress = []
+        report = import_students(
+            io.BytesIO(b"enrollment_number,full_name\n" + b"".join(b"N%d,New %d\n" % (i, i) for i in range(5))),
+            batch_size=2,
+            progress=lambda report: progress.append(report.processed),
+        )
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(report.as_dict()["inserted"], 5)
+        self.assertEqual(Student.objects.filter(enrollment_number__startswith="N").count(), 5)
+
+    def test_import_reports_bad_rows_and_keeps_the_last_duplicate(self):
+        report = import_students(io.BytesIO(
+            b"enrollment_number,full_name,year\n"
+            b"S1,Some Student,\n"
+            b"S2,First Name,1\n"
+            b",Nameless,\n"
+            b"S2,Second Name,2nd Year\n"
+            b"S3,Bad Year,9\n"
+            b"S4,Another Student,\n"
+        ), batch_size=3)
+
+        self.assertEqual(report.as_dict(), {
+            "inserted": 2,
+            "updated": 1,
+            "unchanged": 1,
+            "failed": 2,
+            "errors": [(4, "Missing enrollment_number."), (6, "Invalid year '9'.")],
+        })
+        student = Student.objects.get(enrollment_number="S2")
+        self.assertEqual((student.full_name, student.year), ("Second Name", 2))
+        self.assertFalse(Student.objects.filter(enrollment_number="S3").exists())
+
+    def test_photo_import_updates_matches_and_reports_the_rest(self):
+        student = Student.objects.get(enrollment_number="S1")
+        student.photo.save("old.png", ContentFile(image_bytes()))
+        old_photo, old_thumbnails = student.photo.name, thumbnails.generate_thumbnails(student)
+        Student.objects.create(enrollment_number="S2", full_name="Other Student")
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("notes.txt", b"hello")
+            archive.writestr("photos/s1.jpg", image_bytes(image_format="JPEG"))
+            archive.writestr("X9.jpg", image_bytes(image_format="JPEG"))
+            archive.writestr("S2.jpg", b"not really an image")
+            archive.writestr("photos/S1.png", image_bytes(size=(1600, 800)))
+
+        progress = []
+        with mock.patch("gate.importers.ProcessPoolExecutor", InlineExecutor):
+            report = import_photos(buffer, progress=lambda report: progress.append(report.processed))
+
+        self.assertEqual(progress, [5])
+        counts = report.as_dict()
+        errors = counts.pop("errors")
+        self.assertEqual(counts, {"inserted": 0, "updated": 1, "unchanged": 0, "failed": 4})
+        self.assertEqual(errors[:3], [
+            ("notes.txt", "Not an image file."),
+            ("photos/s1.jpg", "Duplicate photo; the later file was used."),
+            ("X9.jpg", "No student with this enrollment number."),
+        ])
+        self.assertEqual(errors[3][0], "S2.jpg")
+        self.assertTrue(errors[3][1].startswith("Unreadable image: "))
+
+        # The later PNG won, re-encoded as a capped JPEG with fresh thumbnails
+        student = Student.objects.get(pk=student.pk)
+        self.assertEqual(student.photo.name, "student_photos/S1.jpg")
+        with student.photo.open("rb") as fh, Image.open(fh) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (1024, 512)))
+        self.assertEqual(set(student.photo_thumbnails), {"96", "256"})
+        self.assertFalse(default_storage.exists(old_photo))
+        self.assertFalse(default_storage.exists(old_thumbnails["96"]["jpeg"]))
+        self.assertFalse(Student.objects.get(enrollment_number="S2").photo)
+
+
+class HourlyTrafficTests(TestCase):
+    FIELDS = ("hostel_name", "hour", "out_count", "in_count", "returns", "outside_seconds")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = Student.objects.create(enrollment_number="T1", full_name="Traffic One", hostel_name="H1")
+        cls.second = Student.objects.create(enrollment_number="T2", full_name="Traffic Two", hostel_name="H2")
+        cls.hour = analytics.hour_bucket(timezone.now()) - timedelta(hours=3)
+
+    def traffic(self):
+        return list(HourlyTraffic.objects.order_by("hour", "hostel_name").values_list(*self.FIELDS))
+
+    def test_scans_add_to_the_hour_and_match_a_recount(self):
+        scanning.replay_scan(self.first, MovementLog.OUT, self.hour + timedelta(minutes=5))
+        scanning.replay_scan(self.second, MovementLog.OUT, self.hour + timedelta(minutes=10))
+        scanning.replay_scan(self.first, MovementLog.IN, self.hour + timedelta(minutes=35))
+
+        recorded = self.traffic()
+        self.assertEqual(recorded, [
+            ("H1", self.hour, 1, 1, 1, 30 * 60),
+            ("H2", self.hour, 1, 0, 0, 0),
+        ])
+        analytics.recompute_hour(self.hour)
+        self.assertEqual(self.traffic(), recorded)
+        self.assertEqual(HourlyTraffic.objects.get(hostel_name="H1").peak_count, 1)
+
+    def test_catch_up_recounts_only_hours_with_new_logs(self):
+        scanning.replay_scan(self.first, MovementLog.OUT, self.hour)
+        self.assertEqual(analytics.catch_up(), (1, 1))
+
+        # Rows written without record_movement, e.g. by a bulk load, after a gap
+        later = self.hour + timedelta(hours=2)
+        MovementLog.objects.bulk_create([
+            MovementLog(student=self.first, direction=MovementLog.IN, timestamp=later + timedelta(minutes=20)),
+            MovementLog(student=self.second, direction=MovementLog.OUT, timestamp=later + timedelta(hours=1)),
+        ])
+        self.assertEqual(analytics.catch_up(batch_size=1), (2, 2))
+        self.assertEqual(self.traffic(), [
+            ("H1", self.hour, 1, 0, 0, 0),
+            ("H1", later, 0, 1, 1, 2 * 60 * 60 + 20 * 60),
+            ("H2", later + timedelta(hours=1), 1, 0, 0, 0),
+        ])
+        self.assertEqual(analytics.catch_up(), (0, 0))
+
+    def test_report_sums_the_hourly_rows(self):
+        scanning.replay_scan(self.first, MovementLog.OUT, self.hour + timedelta(minutes=5))
+        scanning.replay_scan(self.first, MovementLog.IN, self.hour + timedelta(minutes=45))
+        scanning.replay_scan(self.second, MovementLog.OUT, self.hour + timedelta(minutes=50))
+
+        report = analytics.traffic_report(self.hour - timedelta(days=1))
+        first, second = report["by_hostel"]
+        self.assertEqual((first["hostel_name"], first["out_total"], first["in_total"]), ("H1", 1, 1))
+        self.assertEqual(first["average_outside"], timedelta(minutes=40))
+        self.assertIsNone(second["average_outside"])
+        self.assertEqual([(entry["out_total"], entry["share"]) for entry in report["by_hour"]], [(2, 100)])
+        self.assertEqual(analytics.traffic_report(self.hour - timedelta(days=1), "H2")["by_hostel"], [second])
+
+
+class ThumbnailTests(TemporaryMediaMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+
+    def setUp(self):
+        self.client.force_login(self.guard)
+
+    def student(self, enrollment, photo=None):
+        student = Student.objects.create(enrollment_number=enrollment, full_name="Photo Student")
+        if photo is not None:
+            student.photo.save(f"{enrollment}.png", ContentFile(photo))
+        return student
+
+    def test_thumbnails_are_built_served_and_reused(self):
+        student = self.student("P1", image_bytes())
+        names = thumbnails.generate_thumbnails(student)
+
+        self.assertEqual(set(names), {"96", "256"})
+        for encoded in names.values():
+            self.assertEqual(set(encoded), {"webp", "jpeg"})
+            with default_storage.open(encoded["jpeg"], "rb") as fh:
+                self.assertEqual(Image.open(fh).size[0], int(encoded["jpeg"].split("-")[-2]))
+
+        check = self.client.get(reverse("check"), {"enr": "P1"})
+        self.assertContains(check, "<picture>")
+        url = Student.objects.get(pk=student.pk).photo_srcsets["src"]
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+
+        # Content-hashed names: the same photo maps to the files already stored
+        with mock.patch.object(default_storage, "save", wraps=default_storage.save) as save:
+            self.assertEqual(thumbnails.generate_thumbnails(student), names)
+        save.assert_not_called()
+
+    def test_without_thumbnails_the_pages_fall_back(self):
+        self.student("P2", image_bytes())
+        response = self.client.get(reverse("check"), {"enr": "P2"})
+        self.assertNotContains(response, "<picture>")
+        self.assertContains(response, "/student_photos/P2")
+
+        student = self.student("P3")
+        self.assertIsNone(student.photo_srcsets)
+        self.assertEqual(thumbnails.generate_thumbnails(student), {})
+        self.assertNotContains(self.client.get(reverse("check"), {"enr": "P3"}), "<img")
+
+    def test_cleared_photo_drops_its_thumbnails(self):
+        student = self.student("P4", image_bytes())
+        names = thumbnails.generate_thumbnails(student)
+        student.photo = None
+        thumbnails.generate_thumbnails(student)
+        self.assertFalse(default_storage.exists(names["96"]["webp"]))
+        self.assertEqual(Student.objects.get(pk=student.pk).photo_thumbnails, {})
+
+    def test_thumbnail_view_only_serves_thumbnails(self):
+        for name in ("missing-96-0123456789ab.jpeg", "P1.png"):
+            response = self.client.get(reverse("photo_thumbnail", args=[name]))
+            self.assertEqual(response.status_code, 404)
+
+    def test_backfill_reports_invalid_and_missing_photos(self):
+        good = self.student("P5", image_bytes())
+        self.student("P6", b"not an image")
+        missing = self.student("P7", image_bytes())
+        default_storage.delete(missing.photo.name)
+
+        messages = []
+        with mock.patch("gate.thumbnails.ProcessPoolExecutor", InlineExecutor):
+            built, failed = thumbnails.backfill_thumbnails(Student.objects.all(), chunk_size=2, log=messages.append)
+
+        self.assertEqual((built, failed), (1, 2))
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(Student.objects.get(pk=good.pk).photo_thumbnails)
+        self.assertFalse(Student.objects.filter(photo_thumbnails__has_key="96").exclude(pk=good.pk).exists())
+
+
+class ScannerLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+        cls.student_user = User.objects.create_user("student")
+        now = timezone.now()
+        cls.student = Student.objects.create(
+            enrollment_number="A1", full_name="Lookup Student", hostel_name="H1", room_number="101"
+        )
+        LeaveRequest.objects.create(
+            student=cls.student,
+            request_type=LeaveRequest.OUTPASS,
+            reason="Market",
+            from_date=now - timedelta(hours=1),
+            to_date=now + timedelta(hours=1),
+            status=LeaveRequest.STATUS_APPROVED,
+        )
+        refresh_current_pass(cls.student)
+
+    def lookup(self, enrollments):
+        return self.client.post(reverse("api_check_v2"), json.dumps(enrollments), content_type="application/json")
+
+    def test_lookup_needs_a_guard(self):
+        self.assertEqual(self.lookup(["A1"]).status_code, 302)
+        self.client.force_login(self.student_user)
+        self.assertEqual(self.lookup(["A1"]).status_code, 403)
+
+    def test_lookup_returns_only_the_gate_decision(self):
+        self.client.force_login(self.guard)
+        found, missing = self.lookup(["a1", "NOPE"]).json()["results"]
+        self.assertEqual(set(found), {"query", "found", "enrollment_number", "name", "is_inside", "pass", "can_exit"})
+        self.assertEqual(set(found["pass"]), {"type", "valid_until", "active"})
+        self.assertTrue(found["can_exit"])
+        self.assertEqual(missing, {"query": "NOPE", "found": False})
+
+    def test_lookup_reads_the_db_without_a_shared_cache(self):
+        self.client.force_login(self.guard)
+        self.assertTrue(self.lookup(["A1"]).json()["results"][0]["is_inside"])
+        # Moved by another process, whose invalidation would not reach this one
+        Student.objects.filter(pk=self.student.pk).update(is_inside=False)
+        self.assertFalse(self.lookup(["A1"]).json()["results"][0]["is_inside"])
+
+    @override_settings(LOOKUP_CACHE_TIMEOUT=300)
+    def test_shared_cache_serves_lookups_until_invalidated(self):
+        cache.clear()
+        self.client.force_login(self.guard)
+        self.lookup(["A1"])
+        Student.objects.filter(pk=self.student.pk).update(is_inside=False)
+        self.assertTrue(self.lookup(["A1"]).json()["results"][0]["is_inside"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lookup.invalidate(["a1"])
+        self.assertFalse(self.lookup(["A1"]).json()["results"][0]["is_inside"])
+
+
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.warden.user_permissions.add(Permission.objects.get(codename="can_approve_leave"))
+        cls.student = Student.objects.create(enrollment_number="F1", full_name="Feed Student")
+
+    def setUp(self):
+        self.client.force_login(self.warden)
+
+    def test_wsgi_pages_poll_instead_of_streaming(self):
+        for name in ("home", "warden_dashboard"):
+            with self.subTest(page=name):
+                response = self.client.get(reverse(name))
+                self.assertNotContains(response, "EventSource")
+                self.assertContains(response, reverse("live_poll"))
+
+    @override_settings(GATE_ASYNC_VIEWS=True)
+    def test_asgi_pages_stream(self):
+        self.assertContains(self.client.get(reverse("home")), "EventSource")
+
+    def test_poll_returns_movements_past_the_last_id(self):
+        first = self.client.get(reverse("live_poll")).json()
+        self.assertEqual(first["movements"], [])
+        log = MovementLog.objects.create(student=self.student, direction=MovementLog.OUT)
+
+        data = self.client.get(reverse("live_poll"), {"after": first["last_id"]}).json()
+        self.assertEqual([movement["id"] for movement in data["movements"]], [log.pk])
+        self.assertEqual(data["last_id"], log.pk)
+        self.assertEqual(set(data["occupancy"]), {"inside", "outside", "hostels"})
+
+
+class BulkDecisionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.warden = User.objects.create_user("warden", is_staff=True)
+        cls.warden.user_permissions.add(*Permission.objects.filter(content_type__app_label="gate"))
+        cls.student = Student.objects.create(enrollment_number="B1", full_name="Bulk Student")
+
+    def leave(self, **fields):
+        now = timezone.now()
+        return LeaveRequest.objects.create(
+            student=self.student, request_type=LeaveRequest.LEAVE, reason="Home",
+            from_date=now - timedelta(hours=1), to_date=now + timedelta(days=1), **fields
+        )
+
+    def test_approve_reports_an_outcome_per_request(self):
+        first_stage = self.leave()
+        second_stage = self.leave(supervisor_approved=True)
+        decided = self.leave(status=LeaveRequest.STATUS_REJECTED)
+
+        outcomes = approvals.bulk_decide(
+            [first_stage.pk, second_stage.pk, decided.pk, second_stage.pk, 0], approvals.APPROVE, self.warden
+        )
+
+        self.assertEqual(outcomes, {
+            first_stage.pk: approvals.SUPERVISOR_APPROVED,
+            second_stage.pk: approvals.APPROVED,
+            decided.pk: approvals.SKIPPED,
+            0: approvals.NOT_FOUND,
+        })
+        second_stage.refresh_from_db()
+        self.assertEqual((second_stage.status, second_stage.warden), (LeaveRequest.STATUS_APPROVED, self.warden))
+        # The approved leave is now the student's pass
+        self.assertEqual(Student.objects.get(pk=self.student.pk).current_pass_id, second_stage.pk)
+
+    def test_reject_only_touches_pending_requests(self):
+        pending = self.leave()
+        approved = self.leave(status=LeaveRequest.STATUS_APPROVED)
+
+        outcomes = approvals.bulk_decide([pending.pk, approved.pk], approvals.REJECT, self.warden)
+
+        self.assertEqual(outcomes, {pending.pk: approvals.REJECTED, approved.pk: approvals.SKIPPED})
+        pending.refresh_from_db()
+        approved.refresh_from_db()
+        self.assertEqual(pending.status, LeaveRequest.STATUS_REJECTED)
+        self.assertEqual(pending.rejection_reason, "No reason provided")
+        self.assertEqual(approved.status, LeaveRequest.STATUS_APPROVED)
+
+    def test_view_returns_outcomes_and_refuses_bad_input(self):
+        self.client.force_login(self.warden)
+        pending = self.leave()
+        url = reverse("bulk_leave_action")
+        headers = {"HTTP_ACCEPT": "application/json"}
+
+        response = self.client.post(url, {"action": approvals.REJECT, "ids": [pending.pk]}, **headers)
+        self.assertEqual(response.json(), {"results": [{"id": pending.pk, "outcome": approvals.REJECTED}]})
+
+        response = self.client.post(url, {"action": "delete", "ids": [pending.pk]}, **headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class RoleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("guard")
+        cls.user.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_roles(self):
+        # A new request loads a new User object
+        return roles.roles_for(User.objects.get(pk=self.user.pk))
+
+    @override_settings(ROLE_CACHE_SECONDS=300)
+    def test_permission_change_invalidates_cached_roles(self):
+        self.assertTrue(self.fresh_roles().has_perm("gate.can_toggle_status"))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.roles_for(user).has_perm("gate.can_toggle_status"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.clear()
+        self.assertFalse(self.fresh_roles().has_perm("gate.can_toggle_status"))
+
+    @override_settings(ROLE_CACHE_SECONDS=300, SESSION_ENGINE="django.contrib.sessions.backends.db")
+    def test_expired_roles_do_not_resave_the_session(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("check"))
+        saved = Session.objects.get(pk=self.client.session.session_key).expire_date
+
+        # Past the role cache's lifetime, well inside the session refresh interval
+        later = time.time() + settings.ROLE_CACHE_SECONDS + 1
+        self.assertLess(later - time.time(), settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION)
+        with mock.patch("time.time", return_value=later), CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("check"))
+        self.assertTrue(any("auth_permission" in query["sql"] for query in queries.captured_queries))
+        self.assertFalse(any(query["sql"].startswith("UPDATE \"django_session\"") for query in queries))
+        self.assertEqual(Session.objects.get(pk=self.client.session.session_key).expire_date, saved)
+
+    def test_only_relinking_a_student_login_bumps_the_version(self):
+        student = Student.objects.create(enrollment_number="R1", full_name="Role Student")
+        version = roles.current_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.get(pk=student.pk)
+            student.phone = "9999999999"
+            student.save()
+            Student.objects.only("phone").get(pk=student.pk).save()
+        self.assertEqual(roles.current_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.user = self.user
+            student.save()
+        self.assertEqual(roles.current_version(), version + 1)
+
+    @override_settings(ROLE_CACHE_SECONDS=0)
+    def test_roles_are_not_cached_without_a_shared_cache(self):
+        self.assertTrue(self.fresh_roles().has_perm("gate.can_toggle_status"))
+        # The user row, then groups, permissions and the student link again
+        with self.assertNumQueries(4):
+            self.fresh_roles()
+
+
+@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+class SessionRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guard = User.objects.create_user("guard")
+        cls.guard.user_permissions.add(Permission.objects.get(codename="can_toggle_status"))
+
+    def expire_date(self):
+        return Session.objects.get(pk=self.client.session.session_key).expire_date
+
+    def test_session_is_only_resaved_after_the_refresh_fraction(self):
+        self.client.force_login(self.guard)
+        url = reverse("kiosk_delta")
+        self.client.get(url, {"since": 0})
+        saved = self.expire_date()
+
+        self.client.get(url, {"since": 0})
+        self.assertEqual(self.expire_date(), saved)
+
+        later = time.time() + settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION
+        with mock.patch("gate.sessions.time.time", return_value=later):
+            self.client.get(url, {"since": 0})
+        self.assertGreater(self.expire_date(), saved)
+
+    def test_needs_refresh(self):
+        session = {}
+        self.assertTrue(sessions.needs_refresh(session))
+        sessions.refresh(session, now=1000)
+        with self.settings(SESSION_COOKIE_AGE=1000, SESSION_REFRESH_FRACTION=0.1):
+            self.assertFalse(sessions.needs_refresh(session, now=1099))
+            self.assertTrue(sessions.needs_refresh(session, now=1100))
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        for expire_date in (now - timedelta(days=1),) * 3 + (now + timedelta(days=1),):
+            store = SessionStore()
+            store.set_expiry(expire_date)
+            store.create()
+
+        self.assertEqual(sessions.purge_expired_sessions(batch_size=2, max_batches=1, now=now), 2)
+        self.assertEqual(sessions.purge_expired_sessions(batch_size=2, now=now), 1)
+        self.assertEqual(Session.objects.count(), 1)
+
+
+class MetricsEndpointTests(TestCase):
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_hidden_without_a_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "gate_request_duration_seconds")
+
+    def import_rows(self):
+        import_students(io.BytesIO(b"M1,Metrics Student\nM2,Other Student\n"))
+        return metrics.render()
+
+    @override_settings(METRICS_SHARED_COUNTERS=False)
+    def test_import_counts_are_left_out_without_a_shared_cache(self):
+        self.assertNotIn("gate_import_rows_total", self.import_rows())
+
+    @override_settings(METRICS_SHARED_COUNTERS=True)
+    def test_import_counts_are_shared_through_the_cache(self):
+        cache.clear()
+        self.assertIn('gate_import_rows_total{kind="students",outcome="inserted"} 2', self.import_rows())
+
+
+class BenchmarkTests(TestCase):
+    class RecordingTransport:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, role, method, path, data):
+            self.sent.append((role, method, path, data))
+            return 200
+
+        def close(self):
+            pass
+
+    def seed(self, seed=7):
+        seeding.seed(students=6, logs=30, leaves=12, hostels=2, days=3, seed=seed, batch_size=4)
+
+    def seeded_rows(self):
+        students = seeding.seeded_students().order_by("enrollment_number")
+        return (
+            list(students.values_list("enrollment_number", "full_name", "hostel_name", "room_number", "is_inside")),
+            list(
+                MovementLog.objects.order_by("student__enrollment_number", "timestamp")
+                .values_list("student__enrollment_number", "direction")
+            ),
+            sorted(LeaveRequest.objects.values_list("student__enrollment_number", "request_type", "status")),
+        )
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([benchmark.percentile(values, pct) for pct in (0, 50, 95, 99, 100)], [1, 50, 95, 99, 100])
+        self.assertEqual(benchmark.percentile([1, 2, 3, 4], 99), 4)
+        self.assertIsNone(benchmark.percentile([], 50))
+
+    def test_compare_reports_percentage_changes(self):
+        current = {"scenarios": {
+            "check": {"throughput": 110, "p50_ms": 9, "p95_ms": 12, "p99_ms": None},
+            "home": {"throughput": 50, "p50_ms": 5, "p95_ms": 5, "p99_ms": 5},
+        }}
+        baseline = {"scenarios": {"check": {"throughput": 100, "p50_ms": 10, "p95_ms": 10, "p99_ms": 20}}}
+        self.assertEqual(
+            benchmark.compare(current, baseline),
+            {"check": {"throughput": 10.0, "p50_ms": -10.0, "p95_ms": 20.0}},
+        )
+
+    def test_seed_is_deterministic(self):
+        self.seed()
+        first = self.seeded_rows()
+        self.assertEqual(len(first[0]), 6)
+        self.assertEqual(len(first[1]), 30)
+
+        seeding.flush()
+        self.seed()
+        self.assertEqual(self.seeded_rows(), first)
+
+        seeding.flush()
+        self.seed(seed=8)
+        self.assertNotEqual(self.seeded_rows(), first)
+
+    def test_benchmark_refuses_to_run_without_seeded_students(self):
+        Student.objects.create(enrollment_number="REAL1", full_name="Real Student")
+        with self.assertRaises(ValueError):
+            benchmark.benchmark_users()
+        with self.assertRaises(ValueError):
+            benchmark.run(self.RecordingTransport(), list(benchmark.SCENARIOS.values()), requests=1, warmup=0)
+
+    def test_scenarios_only_target_seeded_students(self):
+        real = Student.objects.create(enrollment_number="REAL1", full_name="Real Student")
+        self.seed()
+
+        users = benchmark.benchmark_users()
+        self.assertTrue(Student.objects.get(user=users[benchmark.STUDENT]).enrollment_number.startswith("SEED"))
+        transport = self.RecordingTransport()
+        benchmark.run(transport, list(benchmark.SCENARIOS.values()), requests=20, concurrency=2, warmup=1)
+
+        targets = {data["enrollment_number"] for _, _, _, data in transport.sent if "enrollment_number" in data}
+        targets |= {data["enr"] for _, _, _, data in transport.sent if "enr" in data}
+        self.assertTrue(targets)
+        self.assertTrue(all(target.startswith(seeding.ENROLLMENT_PREFIX) for target in targets))
+        real.refresh_from_db()
+        self.assertIsNone(real.user)
+
+
+class FragmentVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_scans_leave_the_traffic_report_version_alone(self):
+        student = Student.objects.create(enrollment_number="V1", full_name="Version Student", is_inside=False)
+        version = fragments.version(fragments.TRAFFIC)
+        with self.captureOnCommitCallbacks(execute=True):
+            scanning.toggle_student(student)
+        self.assertEqual(fragments.version(fragments.TRAFFIC), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.recompute_hour(analytics.hour_bucket(timezone.now()))
+        self.assertNotEqual(fragments.version(fragments.TRAFFIC), version)
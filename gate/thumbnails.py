@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+SIZES = (96, 256)
+# WebP for browsers that take it, JPEG for the rest
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpeg": ("JPEG", {"quality": 82, "progressive": True})}
+THUMBNAIL_DIR = "student_photos/thumbs"
+PHOTO_MAX_SIDE = 1024
+
+
+def render_thumbnails(data):
+    """
+    Encode square thumbnails of an image at every size and format.
+    Returns {size: {format: bytes}}. Pure Pillow, so it can run in a worker process.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        rendered = {}
+        for size in SIZES:
+            thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            rendered[size] = {}
+            for ext, (pil_format, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                thumb.save(buffer, pil_format, **options)
+                rendered[size][ext] = buffer.getvalue()
+    return rendered
+
+
+def reencode_photo(data, max_side=PHOTO_MAX_SIDE):
+    """
+    Normalise an uploaded photo: apply EXIF rotation, cap the longest side and
+    save as JPEG. Returns (photo bytes, thumbnails from render_thumbnails()).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85, progressive=True)
+    photo = buffer.getvalue()
+    return photo, render_thumbnails(photo)
+
+
+def reencode_from_bytes(item):
+    """ProcessPool entry point: (key, bytes) -> (key, (photo, thumbnails)) or (key, error message)."""
+    key, data = item
+    try:
+        return key, reencode_photo(data)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        return key, str(exc)
+
+
+def _render_from_bytes(item):
+    """ProcessPool entry point: (pk, bytes) -> (pk, rendered or error message)."""
+    pk, data = item
+    try:
+        return pk, render_thumbnails(data)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        return pk, str(exc)
+
+
+def store_thumbnails(photo_name, rendered):
+    """
+    Save rendered thumbnails under content-hashed names next to the photo and
+    return the name map kept on Student.photo_thumbnails.
+    """
+    stem = os.path.splitext(os.path.basename(photo_name))[0]
+    names = {}
+    for size, encoded in rendered.items():
+        names[str(size)] = {}
+        for ext, data in encoded.items():
+            digest = hashlib.sha1(data).hexdigest()[:12]
+            name = f"{THUMBNAIL_DIR}/{stem}-{size}-{digest}.{ext}"
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            names[str(size)][ext] = name
+    return names
+
+
+def delete_thumbnails(names, keep=None):
+    """Delete stored thumbnails, except any that are also in `keep`."""
+    keep = {name for encoded in (keep or {}).values() for name in encoded.values()}
+    for encoded in names.values():
+        for name in encoded.values():
+            if name not in keep:
+                default_storage.delete(name)
+
+
+def generate_thumbnails(student):
+    """(Re)build thumbnails for student.photo, or drop them if the photo was cleared."""
+    old = student.photo_thumbnails or {}
+    names = {}
+    if student.photo:
+        student.photo.open("rb")
+        try:
+            names = store_thumbnails(student.photo.name, render_thumbnails(student.photo.read()))
+        finally:
+            student.photo.close()
+
+    type(student).objects.filter(pk=student.pk).update(photo_thumbnails=names)
+    student.photo_thumbnails = names
+    student.__dict__.pop("photo_srcsets", None)
+    delete_thumbnails(old, keep=names)
+    return names
+
+
+def backfill_thumbnails(students, workers=None, chunk_size=50, log=None):
+    """
+    Regenerate thumbnails for many students, rendering in a process pool.
+    Storage reads and writes stay in this process. Returns (built, failed).
+    """
+    model = students.model
+    built = failed = 0
+    pending = list(students.exclude(photo="").exclude(photo=None).values_list("pk", "photo", "photo_thumbnails"))
+
+    def read(pk, photo_name):
+        with default_storage.open(photo_name, "rb") as fh:
+            return pk, fh.read()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            photos = {pk: (photo_name, old) for pk, photo_name, old in chunk}
+            items = []
+            for pk, photo_name, _ in chunk:
+                try:
+                    items.append(read(pk, photo_name))
+                except OSError as exc:
+                    failed += 1
+                    if log:
+                        log(f"{pk}: {exc}")
+
+            updates = []
+            for pk, rendered in pool.map(_render_from_bytes, items):
+                if isinstance(rendered, str):
+                    failed += 1
+                    if log:
+                        log(f"{pk}: {rendered}")
+                    continue
+                photo_name, old = photos[pk]
+                names = store_thumbnails(photo_name, rendered)
+                delete_thumbnails(old or {}, keep=names)
+                updates.append(model(pk=pk, photo_thumbnails=names))
+
+            model.objects.bulk_update(updates, ["photo_thumbnails"])
+            built += len(updates)
+    return built, failed
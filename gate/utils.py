@@ -1,8 +1,11 @@
+from .roles import roles_for
+
+
 def is_guard(user):
-    return user.groups.filter(name="Guard").exists()
+    return roles_for(user).is_guard
 
 def is_supervisor(user):
-    return user.groups.filter(name="Supervisor").exists()
+    return roles_for(user).is_supervisor
 
 def is_admin_or_warden(user):
-    return user.is_superuser or user.is_staff
+    return roles_for(user).is_admin_or_warden
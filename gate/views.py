@@ -1,15 +1,44 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required, permission_required
 from django.views.decorators.http import require_http_methods
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import Q, Max, Count
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from datetime import timedelta
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.core.files.storage import default_storage
+from datetime import datetime, timedelta, timezone as dt_timezone
+import csv
+import hmac
+import json
+import os
+import uuid
+from collections import Counter
 
 # Import Models
-from .models import Student, MovementLog, LeaveRequest
+from .models import Student, MovementLog, MovementLogArchive, LeaveRequest, Job
+from .scanning import (
+    NoActivePass,
+    StaleScan,
+    claim_scan_key,
+    find_student,
+    get_active_pass,
+    remember_scan,
+    replay_scan,
+    toggle_student,
+)
+from .passes import refresh_current_pass
+from .jobs import enqueue as enqueue_job
+from . import analytics, approvals, fragments, live, lookup, metrics, occupancy
+from .thumbnails import THUMBNAIL_DIR
+from .pagination import paginate_keyset, paginate_keyset_merged
+from .budgets import query_budget
 
 # Import Forms
 from .forms import (
@@ -17,35 +46,43 @@ from .forms import (
     StudentForm,
     CSVUploadForm,
     StudentProfileForm,
+    LogFilterForm,
+    PhotoZipUploadForm,
 )
 
 # =========================================================
 # POST LOGIN REDIRECT
 # =========================================================
+@query_budget(1)
 @login_required
 def post_login_redirect(request):
-    if hasattr(request.user, "student"):
+    if request.roles.is_student:
         return redirect("student_profile")
     return redirect("home")
 
 # =========================================================
 # HOME (ADMIN / STAFF ONLY)
 # =========================================================
+@query_budget(2)
 @login_required
 def home(request):
-    if hasattr(request.user, "student"):
+    if request.roles.is_student:
         return redirect("student_profile")
 
+    counts = occupancy.get_occupancy()
     context = {
-        "inside_count": Student.objects.filter(is_inside=True).count(),
-        "outside_count": Student.objects.filter(is_inside=False).count(),
+        "inside_count": counts["inside"],
+        "outside_count": counts["outside"],
+        "hostels": counts["hostels"],
         "recent_logs": MovementLog.objects.select_related("student")[:10],
+        "live_stream": settings.GATE_ASYNC_VIEWS,
     }
     return render(request, "gate/home.html", context)
 
 # =========================================================
 # STUDENT PROFILE
 # =========================================================
+@query_budget(3)
 @login_required
 def student_profile(request):
     if not hasattr(request.user, "student"):
@@ -67,9 +104,10 @@ def student_profile(request):
 # =========================================================
 # STUDENT DASHBOARD
 # =========================================================
+@query_budget(4)
 @login_required
 def student_dashboard(request):
-    student = get_object_or_404(Student, user=request.user)
+    student = get_object_or_404(Student.objects.select_related("current_pass"), user=request.user)
     now = timezone.now()
     today = now.date()
 
@@ -95,29 +133,28 @@ def student_dashboard(request):
     else:
         form = LeaveRequestForm()
 
-    # Active Leave (Long term)
-    active_leave = LeaveRequest.objects.filter(
-        student=student,
-        request_type=LeaveRequest.LEAVE,
-        status=LeaveRequest.STATUS_APPROVED,
-        from_date__lte=now,
-        to_date__gte=now
-    ).first()
-
-    # Active Outpass (Today only)
-    active_outpass = LeaveRequest.objects.filter(
-        student=student,
-        request_type=LeaveRequest.OUTPASS,
-        status=LeaveRequest.STATUS_APPROVED,
-        from_date__date=today
-    ).first()
-
+    # Active Leave / Outpass come from the denormalized current pass
+    active_leave = None
+    active_outpass = None
+    current = get_active_pass(student, now)
+    if current and current.request_type == LeaveRequest.LEAVE:
+        active_leave = current
+    elif current:
+        active_outpass = current
+
+    # Today's outpass that ran out before the student came back
+    # (the expire_passes sweeper may already have marked it expired)
     expired_outpass = None
-    if active_outpass and active_outpass.to_date < now:
-        expired_outpass = active_outpass
-        active_outpass = None
+    if active_outpass is None and not student.is_inside:
+        expired_outpass = LeaveRequest.objects.filter(
+            student=student,
+            request_type=LeaveRequest.OUTPASS,
+            status__in=[LeaveRequest.STATUS_APPROVED, LeaveRequest.STATUS_EXPIRED],
+            from_date__date=today,
+            to_date__lt=now
+        ).first()
 
-    # History
+    # History (lazy: only queried when the cached fragment is missing)
     two_days_ago = now - timedelta(days=2)
     recent_requests = LeaveRequest.objects.filter(student=student, created_at__gte=two_days_ago).order_by("-created_at")
 
@@ -129,12 +166,16 @@ def student_dashboard(request):
         "active_outpass": active_outpass,
         "expired_outpass": expired_outpass,
         "now": now,
+        "fragment_timeout": fragments.timeout(),
+        "fragment_version": fragments.student_version(student.pk),
+        "time_bucket": fragments.time_bucket(now),
     }
     return render(request, "gate/student_dashboard.html", context)
 
 # =========================================================
 # APPLY FOR OUTPASS (ONE CLICK)
 # =========================================================
+@query_budget(3)
 @login_required
 @require_http_methods(["POST"])
 def apply_outpass(request):
@@ -173,6 +214,7 @@ def apply_outpass(request):
 # =========================================================
 # GATE CHECK (SEARCH)
 # =========================================================
+@query_budget(3)
 @login_required
 def check(request):
     query = request.POST.get("enrollment_number") or request.GET.get("enr")
@@ -186,84 +228,299 @@ def check(request):
     if query:
         searched = True
         try:
-            student = Student.objects.get(enrollment_number__iexact=query)
+            student = Student.objects.select_related("current_pass").with_enrollment(query).get()
         except Student.DoesNotExist:
-            results = Student.objects.filter(
-                Q(enrollment_number__icontains=query) | Q(full_name__icontains=query)
-            )[:20]
-            if results.count() == 1:
-                student = results.first()
+            results = list(
+                Student.objects.select_related("current_pass").filter(
+                    Q(enrollment_number__icontains=query) | Q(full_name__icontains=query)
+                )[:20]
+            )
+            if len(results) == 1:
+                student = results[0]
                 results = None
 
         if student:
-            now = timezone.now()
-            active_leave = LeaveRequest.objects.filter(
-                student=student,
-                status=LeaveRequest.STATUS_APPROVED,
-                from_date__lte=now,
-                to_date__gte=now
-            ).first()
+            active_leave = get_active_pass(student)
 
     return render(request, "gate/check.html", {
         "searched": searched,
         "student": student,
         "results": results,
         "active_leave": active_leave,
+        # A double-tap resubmits the same key and is dropped by toggle_status
+        "scan_key": uuid.uuid4().hex,
     })
 
 # =========================================================
 # GATE TOGGLE
 # =========================================================
+def _idempotency_key(request):
+    """Client-chosen key that marks repeats of one scan (form field or header)."""
+    key = request.POST.get("idempotency_key") or request.headers.get("Idempotency-Key", "")
+    return key.strip()[:100]
+
+def _expected_inside(request):
+    """The IN/OUT state the guard's screen showed, if the client sent it."""
+    return {"in": True, "out": False}.get(request.POST.get("expected", "").lower())
+
+@query_budget(13)
 @login_required
 @permission_required("gate.can_toggle_status", raise_exception=True)
 @require_http_methods(["POST"])
 def toggle_status(request):
     enrollment = request.POST.get("enrollment_number", "").strip()
     note = request.POST.get("note", "").strip()
-    student = get_object_or_404(Student, enrollment_number=enrollment)
-    now = timezone.now()
+    key = _idempotency_key(request)
+    student = get_object_or_404(Student.objects.select_related("current_pass"), enrollment_number=enrollment)
+    back = f"/gate/check/?enr={student.enrollment_number}"
 
-    if student.is_inside:
-        # Check permissions before letting OUT
-        has_permission = LeaveRequest.objects.filter(
-            student=student,
-            status=LeaveRequest.STATUS_APPROVED,
-            from_date__lte=now,
-            to_date__gte=now
-        ).exists()
+    if key and not claim_scan_key(request.user, key)[0]:
+        messages.info(request, "This scan was already submitted.")
+        return redirect(back)
+
+    try:
+        log, _ = toggle_student(student, user=request.user, note=note, expected_inside=_expected_inside(request))
+    except NoActivePass:
+        if key:
+            remember_scan(request.user, key, None)
+        messages.error(request, "No active approved leave or outpass.")
+        return redirect(back)
+    except StaleScan:
+        if key:
+            remember_scan(request.user, key, None)
+        student.refresh_from_db(fields=["is_inside"])
+        messages.warning(request, f"{student.full_name} is already marked {'IN' if student.is_inside else 'OUT'}.")
+        return redirect(back)
+
+    if key:
+        remember_scan(request.user, key, {"direction": log.direction})
+    messages.success(request, f"{student.full_name} marked {log.direction}.")
+    return redirect(back)
+
+# =========================================================
+# GATE SCAN (LOOKUP + TOGGLE IN ONE ROUND TRIP)
+# =========================================================
+@query_budget(13)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_http_methods(["POST"])
+def scan(request):
+    enrollment = request.POST.get("enrollment_number", "").strip()
+    note = request.POST.get("note", "").strip()
+    key = _idempotency_key(request)
+    if not enrollment:
+        return JsonResponse({"ok": False, "error": "missing_enrollment_number"}, status=400)
+
+    if key:
+        first, previous = claim_scan_key(request.user, key)
+        if not first:
+            if previous is None:
+                return JsonResponse({"ok": False, "error": "in_progress"}, status=409)
+            return JsonResponse({**previous, "duplicate": True})
+
+    student = find_student(enrollment)
+    if student is None:
+        if key:
+            remember_scan(request.user, key, None)
+        return JsonResponse({"ok": False, "error": "not_found", "enrollment_number": enrollment}, status=404)
+
+    payload = {
+        "enrollment_number": student.enrollment_number,
+        "name": student.full_name,
+        "hostel": student.hostel_name,
+        "room": student.room_number,
+    }
+    try:
+        log, active_pass = toggle_student(
+            student, user=request.user, note=note, expected_inside=_expected_inside(request)
+        )
+    except (NoActivePass, StaleScan) as exc:
+        if key:
+            remember_scan(request.user, key, None)
+        if isinstance(exc, StaleScan):
+            student.refresh_from_db(fields=["is_inside"])
+            payload.update({"ok": False, "error": "stale", "is_inside": student.is_inside})
+            return JsonResponse(payload, status=409)
+        payload.update({"ok": False, "error": "no_active_pass", "is_inside": student.is_inside})
+        return JsonResponse(payload, status=403)
+
+    payload.update({
+        "ok": True,
+        "direction": log.direction,
+        "is_inside": student.is_inside,
+        "timestamp": log.timestamp.isoformat(),
+        "pass": {
+            "type": active_pass.request_type,
+            "valid_until": active_pass.to_date.isoformat(),
+        } if active_pass else None,
+    })
+    if key:
+        remember_scan(request.user, key, payload)
+    return JsonResponse(payload)
+
+# =========================================================
+# MOVEMENT LOGS (FILTER / PAGINATE / EXPORT)
+# =========================================================
+def _apply_log_filters(logs, data):
+    """Apply LogFilterForm data to a MovementLog or MovementLogArchive queryset."""
+    tz = timezone.get_current_timezone()
+    if data["date_from"]:
+        logs = logs.filter(timestamp__gte=datetime.combine(data["date_from"], datetime.min.time(), tzinfo=tz))
+    if data["date_to"]:
+        day_after = data["date_to"] + timedelta(days=1)
+        logs = logs.filter(timestamp__lt=datetime.combine(day_after, datetime.min.time(), tzinfo=tz))
+    if data["hostel"]:
+        logs = logs.filter(student__hostel_name=data["hostel"])
+    if data["direction"]:
+        logs = logs.filter(direction=data["direction"])
+    if data["guard"]:
+        logs = logs.filter(recorded_by__username=data["guard"])
+    if data["student"]:
+        logs = logs.filter(student__in=Student.objects.with_enrollment(data["student"]).values("pk"))
+    return logs
+
+def _filtered_logs(request):
+    """
+    Return (form, live logs, archived logs). The archive queryset is None
+    unless the requested range reaches back into archived months. An invalid
+    form matches nothing rather than everything.
+    """
+    form = LogFilterForm(request.GET or None, hostels=occupancy.hostel_names())
+    logs = MovementLog.objects.select_related("student", "recorded_by")
+    archived = MovementLogArchive.objects.select_related("student", "recorded_by")
+    if form.is_bound and not form.is_valid():
+        return form, logs.none(), None
+    # An unbound form lists everything, unfiltered
+    data = form.cleaned_data if form.is_bound else dict.fromkeys(LogFilterForm.base_fields)
+    newest_archived = archived.order_by("-timestamp").values_list("timestamp", flat=True).first()
+    if newest_archived is None or (
+        data["date_from"] and timezone.localdate(newest_archived) < data["date_from"]
+    ):
+        archived = None
+    else:
+        archived = _apply_log_filters(archived, data)
+    return form, _apply_log_filters(logs, data), archived
 
-        if not has_permission:
-            messages.error(request, "No active approved leave or outpass.")
-            return redirect(f"/gate/check/?enr={student.enrollment_number}")
+@query_budget(3)
+@login_required
+def logs(request):
+    if request.roles.is_student:
+        return redirect("student_profile")
 
-        student.is_inside = False
-        direction = MovementLog.OUT
+    form, queryset, archived = _filtered_logs(request)
+    if archived is None:
+        page = paginate_keyset(queryset, ("-timestamp", "-id"), request)
     else:
-        # Letting IN
-        student.is_inside = True
-        direction = MovementLog.IN
-        
-        # Expire Outpass on return
-        LeaveRequest.objects.filter(
-            student=student,
-            request_type=LeaveRequest.OUTPASS,
-            status=LeaveRequest.STATUS_APPROVED
-        ).update(status=LeaveRequest.STATUS_EXPIRED, to_date=now)
+        page = paginate_keyset_merged([queryset, archived], ("-timestamp", "-id"), request)
+    return render(request, "gate/logs.html", {"form": form, "logs": page, "page": page})
 
-    student.save()
-    MovementLog.objects.create(
-        student=student,
-        direction=direction,
-        recorded_by=request.user,
-        note=note
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer."""
+
+    def write(self, value):
+        return value
+
+@query_budget(3)
+@login_required
+def export_logs(request):
+    if request.roles.is_student:
+        return redirect("student_profile")
+
+    form, queryset, archived = _filtered_logs(request)
+    if form.errors:
+        return HttpResponse(form.errors.as_text(), status=400, content_type="text/plain; charset=utf-8")
+    columns = (
+        "timestamp",
+        "student__enrollment_number",
+        "student__full_name",
+        "student__hostel_name",
+        "direction",
+        "recorded_by__username",
+        "note",
     )
+    # Archived rows all predate the live table, so they simply follow it
+    sources = [queryset] if archived is None else [queryset, archived]
+    sources = [source.order_by("-timestamp", "-id").values_list(*columns) for source in sources]
+
+    def stream():
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["timestamp", "enrollment_number", "full_name", "hostel", "direction", "recorded_by", "note"])
+        # iterator() streams from a server-side cursor, so memory stays flat
+        for rows in sources:
+            for row in rows.iterator(chunk_size=2000):
+                yield writer.writerow([row[0].isoformat(), *row[1:5], row[5] or "", row[6]])
+
+    filename = f"movement-logs-{timezone.localdate():%Y%m%d}.csv"
+    response = StreamingHttpResponse(stream(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+# =========================================================
+# WARDEN ANALYTICS (READS HOURLY AGGREGATES ONLY)
+# =========================================================
+ANALYTICS_MAX_DAYS = 90
+
+@query_budget(4)
+@login_required
+@permission_required("gate.can_approve_leave", raise_exception=True)
+def warden_dashboard(request):
+    days = request.GET.get("days", "")
+    days = min(max(int(days), 1), ANALYTICS_MAX_DAYS) if days.isdigit() else 7
+    hostel = request.GET.get("hostel", "")
+
+    now = timezone.now()
+    since = analytics.hour_bucket(now) - timedelta(days=days)
+    return render(request, "gate/warden_dashboard.html", {
+        # Only run when the cached report tables are missing
+        "report": SimpleLazyObject(lambda: analytics.traffic_report(since, hostel or None)),
+        "since": since,
+        "days": days,
+        "hostel": hostel,
+        "hostels": occupancy.hostel_names(),
+        "fragment_timeout": fragments.timeout(),
+        # Scans update the current hour constantly, so the report follows
+        # them once per time bucket rather than per scan
+        "traffic_version": fragments.version(fragments.TRAFFIC),
+        "time_bucket": fragments.time_bucket(now),
+        # Only the async live_feed can stream without tying up a worker thread
+        "live_stream": settings.GATE_ASYNC_VIEWS,
+    })
+
+@query_budget(1)
+@login_required
+@permission_required("gate.can_approve_leave", raise_exception=True)
+def live_feed(request):
+    """Server-Sent Events stream of new movements and occupancy changes."""
+    subscriber = live.Subscriber()
+    after = live.last_event_id(request)
+
+    def stream():
+        live.broadcaster.subscribe(subscriber, after)
+        try:
+            yield f"retry: {live.RETRY_MS}\n\n"
+            while not subscriber.dropped:
+                message = subscriber.get(timeout=live.KEEPALIVE_SECONDS)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            live.broadcaster.unsubscribe(subscriber)
+
+    return live.event_stream_response(stream())
 
-    messages.success(request, f"{student.full_name} marked {direction}.")
-    return redirect(f"/gate/check/?enr={student.enrollment_number}")
+@query_budget(2)
+@login_required
+@permission_required("gate.can_approve_leave", raise_exception=True)
+@require_GET
+def live_poll(request):
+    """What live_feed streams, one poll at a time: occupancy plus movements past ?after=<id>."""
+    after = request.GET.get("after", "")
+    return JsonResponse(live.poll(int(after) if after.isdigit() else None))
 
 # =========================================================
 # APPROVAL DASHBOARD (UPDATED)
 # =========================================================
+APPROVAL_COUNT_STATUSES = [LeaveRequest.STATUS_PENDING, LeaveRequest.STATUS_APPROVED, LeaveRequest.STATUS_REJECTED]
+
+@query_budget(3)
 @login_required
 @permission_required("gate.can_approve_leave", raise_exception=True)
 def approval_dashboard(request):
@@ -278,19 +535,26 @@ def approval_dashboard(request):
         requests_qs = requests_qs.filter(status=status_filter)
 
     # 3. Role Based Logic
-    if request.user.groups.filter(name="Supervisor").exists():
+    if request.roles.is_supervisor:
         requests_qs = requests_qs.filter(status=LeaveRequest.STATUS_PENDING)
 
-    # 4. Calculate Counts for the Dashboard Cards
-    pending_count = LeaveRequest.objects.filter(status=LeaveRequest.STATUS_PENDING).count()
-    approved_count = LeaveRequest.objects.filter(status=LeaveRequest.STATUS_APPROVED).count()
-    rejected_count = LeaveRequest.objects.filter(status=LeaveRequest.STATUS_REJECTED).count()
+    # 4. Calculate Counts for the Dashboard Cards (one query, status index only,
+    # and only when the cached stat cards are missing)
+    counts = SimpleLazyObject(lambda: LeaveRequest.objects.filter(status__in=APPROVAL_COUNT_STATUSES).aggregate(
+        **{
+            f"{status}_count": Count("pk", filter=Q(status=status))
+            for status in APPROVAL_COUNT_STATUSES
+        }
+    ))
+
+    page = paginate_keyset(requests_qs, ("-created_at", "-id"), request)
 
     context = {
-        "requests": requests_qs,
-        "pending_count": pending_count,
-        "approved_count": approved_count,
-        "rejected_count": rejected_count,
+        "requests": page,
+        "page": page,
+        "counts": counts,
+        "fragment_timeout": fragments.timeout(),
+        "leaves_version": fragments.version(fragments.LEAVES),
         "status_filter": status_filter,
     }
 
@@ -299,11 +563,12 @@ def approval_dashboard(request):
 # =========================================================
 # APPROVE / REJECT ACTIONS
 # =========================================================
+@query_budget(3)
 @login_required
 @permission_required("gate.can_approve_leave", raise_exception=True)
 @require_http_methods(["POST"])
 def approve_leave(request, request_id):
-    leave = get_object_or_404(LeaveRequest, id=request_id)
+    leave = get_object_or_404(LeaveRequest.objects.select_related("student"), id=request_id)
     
     if not leave.supervisor_approved:
         leave.supervisor_approved = True
@@ -316,26 +581,74 @@ def approve_leave(request, request_id):
         leave.status = LeaveRequest.STATUS_APPROVED
     
     leave.save()
+    if leave.status == LeaveRequest.STATUS_APPROVED:
+        refresh_current_pass(leave.student)
+        metrics.LEAVE_DECISIONS.inc(decision=approvals.APPROVED)
+    else:
+        metrics.LEAVE_DECISIONS.inc(decision=approvals.SUPERVISOR_APPROVED)
     messages.success(request, "Request approved.")
     return redirect("approval_dashboard")
 
+@query_budget(5)
 @login_required
 @permission_required("gate.can_approve_leave", raise_exception=True)
 @require_http_methods(["POST"])
 def reject_leave(request, request_id):
-    leave = get_object_or_404(LeaveRequest, id=request_id)
+    leave = get_object_or_404(LeaveRequest.objects.select_related("student"), id=request_id)
     leave.status = LeaveRequest.STATUS_REJECTED
     leave.rejection_reason = request.POST.get("rejection_reason", "No reason provided")
     leave.save()
+    refresh_current_pass(leave.student)
+    metrics.LEAVE_DECISIONS.inc(decision=approvals.REJECTED)
     messages.warning(request, "Request rejected.")
     return redirect("approval_dashboard")
 
+BULK_DECISION_MAX = 500
+BULK_OUTCOME_LABELS = {
+    approvals.SUPERVISOR_APPROVED: "sent on for warden approval",
+    approvals.APPROVED: "approved",
+    approvals.REJECTED: "rejected",
+    approvals.SKIPPED: "skipped (no longer pending)",
+    approvals.NOT_FOUND: "not found",
+}
+
+@query_budget(5)
+@login_required
+@permission_required("gate.can_approve_leave", raise_exception=True)
+@require_http_methods(["POST"])
+def bulk_leave_action(request):
+    action = request.POST.get("action")
+    ids = [int(value) for value in request.POST.getlist("ids") if value.isdigit()]
+    if action not in (approvals.APPROVE, approvals.REJECT) or not ids or len(ids) > BULK_DECISION_MAX:
+        if not request.accepts("text/html"):
+            return JsonResponse({"error": f"pick an action and 1-{BULK_DECISION_MAX} requests"}, status=400)
+        messages.error(request, f"Select between 1 and {BULK_DECISION_MAX} requests and an action.")
+        return redirect("approval_dashboard")
+
+    outcomes = approvals.bulk_decide(
+        ids, action, request.user, reason=request.POST.get("rejection_reason", "").strip()
+    )
+    if not request.accepts("text/html"):
+        return JsonResponse({"results": [{"id": pk, "outcome": outcome} for pk, outcome in outcomes.items()]})
+
+    totals = Counter(outcomes.values())
+    summary = ", ".join(f"{count} {BULK_OUTCOME_LABELS[outcome]}" for outcome, count in totals.items())
+    level = messages.WARNING if totals[approvals.SKIPPED] or totals[approvals.NOT_FOUND] else messages.SUCCESS
+    messages.add_message(request, level, f"{len(outcomes)} request(s): {summary}.")
+    # Back to the same tab of the dashboard
+    status = request.POST.get("status", "")
+    if status in dict(LeaveRequest.STATUS_CHOICES) or status == "all":
+        return redirect(f"{reverse('approval_dashboard')}?status={status}")
+    return redirect("approval_dashboard")
+
 # =========================================================
 # ADMIN HELPERS (ADD STUDENT, CSV, ETC)
 # =========================================================
+@query_budget(3)
 @login_required
+@permission_required("gate.add_student", raise_exception=True)
 def add_student(request):
-    if request.user.groups.filter(name="Guard").exists():
+    if request.roles.is_guard:
         messages.error(request, "Access Denied.")
         return redirect("home")
 
@@ -349,39 +662,330 @@ def add_student(request):
         form = StudentForm()
     return render(request, "gate/add_student.html", {"form": form})
 
+@query_budget(2)
 @login_required
+@permission_required("gate.add_student", raise_exception=True)
 def import_students_csv(request):
+    if request.roles.is_guard:
+        messages.error(request, "Access Denied.")
+        return redirect("home")
+
     if request.method == "POST":
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            import csv, io
-            reader = csv.reader(io.StringIO(request.FILES["file"].read().decode("utf-8")))
-            for row in reader:
-                if len(row) < 2 or "enrollment" in row[0].lower(): continue
-                Student.objects.update_or_create(
-                    enrollment_number=row[0].strip(),
-                    defaults={"full_name": row[1].strip()}
-                )
-            messages.success(request, "CSV Imported.")
-            return redirect("home")
+            job = enqueue_job(Job.IMPORT_STUDENTS, upload=request.FILES["file"], user=request.user)
+            messages.success(request, "CSV uploaded. The import is running in the background.")
+            return redirect(f"{reverse('import_students_csv')}?job={job.pk}")
     else:
         form = CSVUploadForm()
-    return render(request, "gate/import_students_csv.html", {"form": form})
 
+    return _import_page(request, form, PhotoZipUploadForm())
+
+@query_budget(2)
+@login_required
+@permission_required("gate.add_student", raise_exception=True)
+@require_http_methods(["POST"])
+def import_photos_zip(request):
+    if request.roles.is_guard:
+        messages.error(request, "Access Denied.")
+        return redirect("home")
+
+    photo_form = PhotoZipUploadForm(request.POST, request.FILES)
+    if photo_form.is_valid():
+        job = enqueue_job(Job.IMPORT_PHOTOS, upload=request.FILES["file"], user=request.user)
+        messages.success(request, "ZIP uploaded. Photos are being imported in the background.")
+        return redirect(f"{reverse('import_students_csv')}?job={job.pk}")
+
+    return _import_page(request, CSVUploadForm(), photo_form)
+
+def _import_page(request, form, photo_form):
+    job = None
+    job_id = request.GET.get("job", "")
+    if job_id.isdigit():
+        job = Job.objects.filter(pk=job_id, created_by=request.user).first()
+
+    return render(request, "gate/import_students_csv.html", {
+        "form": form,
+        "photo_form": photo_form,
+        "job": job,
+        "report": job.result if job and job.status == Job.STATUS_DONE else None,
+    })
+
+@query_budget(2)
+@login_required
+def job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({"error": "forbidden"}, status=403)
+
+    return JsonResponse({
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "finished": job.is_finished,
+        "result": job.result,
+        "error": job.error.strip().splitlines()[-1] if job.error else "",
+    })
+
+@query_budget(2)
 @login_required
 def inside_list(request):
-    return render(request, "gate/list.html", {"students": Student.objects.filter(is_inside=True), "title": "Inside Campus"})
+    page = paginate_keyset(Student.objects.filter(is_inside=True), ("enrollment_number",), request)
+    return render(request, "gate/list.html", {"students": page, "page": page, "title": "Inside Campus"})
 
+@query_budget(2)
 @login_required
 def outside_list(request):
-    return render(request, "gate/list.html", {"students": Student.objects.filter(is_inside=False), "title": "Outside Campus"})
+    page = paginate_keyset(Student.objects.filter(is_inside=False), ("enrollment_number",), request)
+    return render(request, "gate/list.html", {"students": page, "page": page, "title": "Outside Campus"})
 
+@query_budget(1)
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_check(request):
     enr = request.POST.get("enrollment_number", "").strip()
     try:
-        s = Student.objects.get(enrollment_number__iexact=enr)
+        s = Student.objects.with_enrollment(enr).get()
         return JsonResponse({"found": True, "name": s.full_name, "is_inside": s.is_inside})
     except Student.DoesNotExist:
-        return JsonResponse({"found": False}, status=404)
\ No newline at end of file
+        return JsonResponse({"found": False}, status=404)
+
+API_CHECK_MAX_IDS = 200
+
+@query_budget(2)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_http_methods(["POST"])
+def api_check_v2(request):
+    """
+    Batch lookup for handheld scanners signed in as a guard. Takes a JSON
+    list of enrollment numbers (or {"enrollment_numbers": [...]}) and
+    returns one allow/deny result per entry, in order.
+    """
+    try:
+        payload = json.loads(request.body)
+        if isinstance(payload, dict):
+            payload = payload["enrollment_numbers"]
+        if not isinstance(payload, list) or not all(isinstance(value, (str, int)) for value in payload):
+            raise ValueError
+    except (ValueError, KeyError):
+        return JsonResponse({"error": "expected a JSON list of enrollment numbers"}, status=400)
+    if len(payload) > API_CHECK_MAX_IDS:
+        return JsonResponse({"error": f"at most {API_CHECK_MAX_IDS} enrollment numbers per request"}, status=400)
+
+    now = timezone.now()
+    return JsonResponse({"checked_at": now.isoformat(), "results": lookup.lookup_students(payload, now)})
+
+# =========================================================
+# PHOTO THUMBNAILS
+# =========================================================
+THUMBNAIL_TYPES = {".webp": "image/webp", ".jpeg": "image/jpeg"}
+
+@query_budget(1)
+@login_required
+@require_GET
+def photo_thumbnail(request, name):
+    # Names carry a content hash, so a URL never changes meaning
+    ext = os.path.splitext(name)[1]
+    if ext not in THUMBNAIL_TYPES or os.path.basename(name) != name:
+        raise Http404
+    try:
+        fh = default_storage.open(f"{THUMBNAIL_DIR}/{name}", "rb")
+    except (FileNotFoundError, OSError):
+        raise Http404
+    response = FileResponse(fh, content_type=THUMBNAIL_TYPES[ext])
+    response["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
+
+# =========================================================
+# KIOSK SYNC API (OFFLINE GATE)
+# =========================================================
+# Kiosks cache every student locally and keep answering lookups when the
+# network drops. Versions are Student.updated_at in epoch microseconds; pass
+# changes reach the cache because they rewrite Student.current_pass. A
+# truncated delta carries a "next" cursor ("<version>.<student id>") for the
+# following page, so rows sharing one updated_at are never skipped or repeated.
+KIOSK_FIELDS = ["enrollment_number", "full_name", "is_inside", "pass_valid_from", "pass_valid_until"]
+KIOSK_DELTA_LIMIT = 5000
+KIOSK_MAX_SCANS = 1000
+# Re-send rows this close to the version, so commits that landed slightly
+# out of order are not missed. Kiosks upsert, so duplicates are harmless.
+KIOSK_SYNC_OVERLAP = timedelta(seconds=5)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _to_version(dt):
+    # Integer arithmetic, so a version converts back to the exact updated_at
+    return (dt - EPOCH) // timedelta(microseconds=1) if dt else 0
+
+
+def _from_version(version):
+    return EPOCH + timedelta(microseconds=version)
+
+
+def _epoch(dt):
+    return int(dt.timestamp()) if dt else None
+
+
+def _kiosk_rows(queryset):
+    """
+    Compact [enr, name, is_inside, pass_from, pass_until] rows, the newest
+    updated_at, and the (updated_at, pk) of the last row.
+    """
+    rows = []
+    latest = last = None
+    for *values, updated_at, pk in queryset.values_list(*KIOSK_FIELDS, "updated_at", "pk").iterator(chunk_size=2000):
+        enrollment, name, is_inside, pass_from, pass_until = values
+        rows.append([enrollment, name, is_inside, _epoch(pass_from), _epoch(pass_until)])
+        if latest is None or updated_at > latest:
+            latest = updated_at
+        last = (updated_at, pk)
+    return rows, latest, last
+
+
+def _kiosk_etag(request):
+    state = Student.objects.aggregate(latest=Max("updated_at"), count=Count("id"))
+    return f"{_to_version(state['latest'])}-{state['count']}"
+
+
+@query_budget(3)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_GET
+@gzip_page
+@condition(etag_func=_kiosk_etag)
+def kiosk_snapshot(request):
+    rows, latest, _ = _kiosk_rows(Student.objects.order_by())
+    return JsonResponse({
+        "version": _to_version(latest),
+        "fields": ["enrollment_number", "name", "is_inside", "pass_from", "pass_until"],
+        "students": rows,
+    })
+
+
+@query_budget(2)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_GET
+@gzip_page
+def kiosk_delta(request):
+    since = request.GET.get("since", "")
+    if not since.isdigit():
+        return JsonResponse({"error": "since must be a version from a previous snapshot"}, status=400)
+    since = int(since)
+
+    after = request.GET.get("after")
+    if after is None:
+        changed = Student.objects.filter(updated_at__gt=_from_version(since) - KIOSK_SYNC_OVERLAP)
+    else:
+        # Following a truncated page: continue exactly after its last row,
+        # without the overlap, or a full window of ties would repeat forever
+        version, _, pk = after.partition(".")
+        if not (version.isdigit() and pk.isdigit()):
+            return JsonResponse({"error": "after must be the next cursor of a truncated delta"}, status=400)
+        after_at = _from_version(int(version))
+        changed = Student.objects.filter(Q(updated_at__gt=after_at) | Q(updated_at=after_at, pk__gt=int(pk)))
+    rows, latest, last = _kiosk_rows(changed.order_by("updated_at", "pk")[:KIOSK_DELTA_LIMIT])
+    truncated = len(rows) == KIOSK_DELTA_LIMIT
+
+    return JsonResponse({
+        "version": max(_to_version(latest), since),
+        # More rows are waiting; call again with since and after=next
+        "truncated": truncated,
+        "next": f"{_to_version(last[0])}.{last[1]}" if truncated else None,
+        "fields": ["enrollment_number", "name", "is_inside", "pass_from", "pass_until"],
+        "students": rows,
+    })
+
+
+@query_budget(9)
+@login_required
+@permission_required("gate.can_toggle_status", raise_exception=True)
+@require_http_methods(["POST"])
+def kiosk_upload_scans(request):
+    try:
+        scans = json.loads(request.body)["scans"]
+        if not isinstance(scans, list):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "expected a JSON body with a 'scans' list"}, status=400)
+    if len(scans) > KIOSK_MAX_SCANS:
+        return JsonResponse({"error": f"at most {KIOSK_MAX_SCANS} scans per batch"}, status=400)
+
+    now = timezone.now()
+    results = [None] * len(scans)
+    queued = []
+    for index, scan in enumerate(scans):
+        scan = scan if isinstance(scan, dict) else {}
+        enrollment = str(scan.get("enrollment_number", "")).strip()
+        direction = scan.get("direction")
+        timestamp = parse_datetime(str(scan.get("timestamp", "")))
+        if not enrollment or direction not in (MovementLog.IN, MovementLog.OUT) or timestamp is None:
+            results[index] = {"index": index, "status": "invalid"}
+            continue
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+        queued.append((min(timestamp, now), index, enrollment, direction, str(scan.get("note", ""))[:500]))
+
+    # One query for the students, one for their latest movement
+    students = {
+        s.enrollment_number.upper(): s
+        for s in Student.objects.select_related("current_pass").with_enrollments(q[2] for q in queued)
+    }
+    last_movement = dict(
+        MovementLog.objects.filter(student__in=students.values())
+        .order_by()
+        .values("student")
+        .annotate(last=Max("timestamp"))
+        .values_list("student", "last")
+    )
+
+    # Replay in the order the scans happened at the gate
+    for timestamp, index, enrollment, direction, note in sorted(queued):
+        result = {"index": index, "enrollment_number": enrollment}
+        results[index] = result
+        student = students.get(enrollment.upper())
+        if student is None:
+            result["status"] = "not_found"
+        elif last_movement.get(student.pk) and timestamp <= last_movement[student.pk]:
+            # The server already has a newer movement for this student
+            result["status"] = "stale"
+        elif student.is_inside == (direction == MovementLog.IN):
+            result["status"] = "duplicate"
+        else:
+            try:
+                log, flagged = replay_scan(student, direction, timestamp, user=request.user, note=note)
+            except StaleScan:
+                # Another kiosk or guard recorded this movement first; reload
+                # what they wrote so later scans of this student compare
+                # against it
+                result["status"] = "duplicate"
+                student.refresh_from_db(fields=["is_inside", "current_pass", "pass_valid_from", "pass_valid_until"])
+                last_movement[student.pk] = (
+                    MovementLog.objects.filter(student=student).aggregate(last=Max("timestamp"))["last"]
+                )
+            else:
+                last_movement[student.pk] = log.timestamp
+                result["status"] = "flagged" if flagged else "applied"
+
+    return JsonResponse({"results": results})
+
+
+# =========================================================
+# MONITORING
+# =========================================================
+@query_budget(0)
+@require_GET
+def metrics_view(request):
+    """This process's metrics in Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Never public outside development
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)